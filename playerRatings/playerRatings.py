@@ -361,6 +361,15 @@ class PlayerRatings(commands.Cog):
             return (player.wins, player.losses, player.elo_rating)
         return None
 
+    async def get_players_records_and_ratings_by_ids(self, guild, member_ids):
+        """Gets the (wins, losses, rating) of every member id from a single read of the guild's players, None for members without a record"""
+        players = {value["Id"]: value for value in (await self.config.guild(guild).Players()).values()}
+        records = {}
+        for member_id in member_ids:
+            value = players.get(member_id)
+            records[member_id] = (value["Wins"], value["Losses"], value["EloRating"]) if value else None
+        return records
+
     async def guild_has_players(self, ctx):
         await self.load_players(ctx)
         if self.players:
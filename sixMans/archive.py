@@ -0,0 +1,39 @@
+import gzip
+import json
+import os
+
+player_points_key = "Points"
+player_gp_key = "GamesPlayed"
+player_wins_key = "Wins"
+archive_players_key = "Players"
+archive_scores_key = "Scores"
+
+def summarize_scores(scores, totals):
+    """Adds the scores to `totals`, a per-queue/per-player summary: {queue_id: {"Scores": int, "Players": {player_id: {...}}}}"""
+    for score in scores:
+        queue_totals = totals.setdefault("{0}".format(score["Queue"]), {archive_scores_key: 0, archive_players_key: {}})
+        queue_totals[archive_scores_key] += 1
+        player_dict = queue_totals[archive_players_key].setdefault("{0}".format(score["Player"]), {})
+        player_dict[player_points_key] = player_dict.get(player_points_key, 0) + score["Points"]
+        player_dict[player_gp_key] = player_dict.get(player_gp_key, 0) + 1
+        player_dict[player_wins_key] = player_dict.get(player_wins_key, 0) + score["Win"]
+    return totals
+
+def write_archive(directory, first_segment, scores):
+    """Writes the raw scores to a gzipped JSON lines file and returns its path. Blocking, so run it in an executor.
+    The file is named after the first segment it holds, so archiving from the same segment again replaces it."""
+    os.makedirs(directory, exist_ok=True)
+    file_name = "scores-{0}-{1}.jsonl.gz".format(first_segment, scores[0]["DateTime"])
+    path = os.path.join(directory, file_name)
+    with gzip.open(path, "wt", encoding="utf-8") as archive_file:
+        for score in scores:
+            archive_file.write(json.dumps(score))
+            archive_file.write("\n")
+    return path
+
+def read_archive(path):
+    """Yields the scores stored in an archive file, oldest first."""
+    with gzip.open(path, "rt", encoding="utf-8") as archive_file:
+        for line in archive_file:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,59 @@
+import itertools
+
+exhaustive_limit = 10           # Largest number of players that will have every possible split checked
+
+def team_gap(blue, orange, ratings):
+    return abs(sum(ratings[player] for player in blue) - sum(ratings[player] for player in orange))
+
+def exhaustive_split(players, ratings):
+    """Checks every split of the players into two even teams and returns the one with the smallest rating gap.
+    The first player is always put on blue so mirrored splits aren't checked twice (10 splits for 6 players)."""
+    players = list(players)
+    first, rest = players[0], players[1:]
+    best = None
+    best_gap = None
+    for others in itertools.combinations(rest, len(players) // 2 - 1):
+        blue = [first] + list(others)
+        orange = [player for player in rest if player not in others]
+        gap = team_gap(blue, orange, ratings)
+        if best_gap is None or gap < best_gap:
+            best, best_gap = (blue, orange), gap
+    return best
+
+def greedy_split(players, ratings):
+    """Adds players from highest to lowest rating to whichever team has the lower total (while it has room),
+    then keeps swapping the pair of players that narrows the gap the most until no swap helps."""
+    team_size = len(players) // 2
+    blue, orange = [], []
+    blue_total = orange_total = 0
+    for player in sorted(players, key=lambda player: ratings[player], reverse=True):
+        if len(orange) >= team_size or (len(blue) < team_size and blue_total <= orange_total):
+            blue.append(player)
+            blue_total += ratings[player]
+        else:
+            orange.append(player)
+            orange_total += ratings[player]
+
+    while True:
+        gap = blue_total - orange_total
+        best_swap = None
+        best_gap = abs(gap)
+        for i, blue_player in enumerate(blue):
+            for j, orange_player in enumerate(orange):
+                delta = ratings[blue_player] - ratings[orange_player]
+                new_gap = abs(gap - 2 * delta)
+                if new_gap < best_gap:
+                    best_swap, best_gap = (i, j, delta), new_gap
+        if best_swap is None:
+            return blue, orange
+        i, j, delta = best_swap
+        blue[i], orange[j] = orange[j], blue[i]
+        blue_total -= delta
+        orange_total += delta
+
+def balance_teams(players, ratings, balancer=None):
+    """Splits the players into two teams with totals as close as possible.
+    `ratings` maps each player to a number. If no balancer is given, small games are solved exactly and larger ones use the greedy heuristic."""
+    if balancer is None:
+        balancer = exhaustive_split if len(players) <= exhaustive_limit else greedy_split
+    return balancer(players, ratings)
@@ -0,0 +1,61 @@
+player_points_key = "Points"
+player_gp_key = "GamesPlayed"
+player_wins_key = "Wins"
+bucket_players_key = "Players"
+bucket_gp_key = "GamesPlayed"
+bucket_size = 3600                          # Seconds covered by a single bucket (1 Hour)
+bucket_retention = 31 * 24                  # How many buckets are kept before being pruned (31 Days)
+
+class ScoreBuckets:
+    """Rolls scores up into hourly per-queue buckets so windowed leaderboards can be built by merging
+    a bounded number of small buckets instead of replaying the full score history.
+
+    Layout: {bucket_key: {queue_id: {"GamesPlayed": int, "Players": {player_id: {"Points", "GamesPlayed", "Wins"}}}}}
+    """
+    def __init__(self, buckets=None):
+        self.buckets = buckets if buckets is not None else {}
+
+    @staticmethod
+    def bucket_key(timestamp: int):
+        return str(int(timestamp) // bucket_size)
+
+    def add_score(self, score):
+        queue_bucket = self._queue_bucket(self.bucket_key(score["DateTime"]), score["Queue"])
+        player_dict = queue_bucket[bucket_players_key].setdefault("{0}".format(score["Player"]), {})
+        player_dict[player_points_key] = player_dict.get(player_points_key, 0) + score["Points"]
+        player_dict[player_gp_key] = player_dict.get(player_gp_key, 0) + 1
+        player_dict[player_wins_key] = player_dict.get(player_wins_key, 0) + score["Win"]
+
+    def add_game(self, queue_id, timestamp: int):
+        queue_bucket = self._queue_bucket(self.bucket_key(timestamp), queue_id)
+        queue_bucket[bucket_gp_key] += 1
+
+    def collect(self, start_time: int, queue_id=None):
+        """Merges every bucket that starts at or after `start_time`. Returns the same (players, games_played) pair as a raw score scan.
+        The bucket `start_time` falls in is left out unless it starts exactly then, so a window never covers more than it asks for."""
+        start_key = -(-int(start_time) // bucket_size)
+        players = {}
+        games_played = 0
+        for key, queue_buckets in self.buckets.items():
+            if int(key) < start_key:
+                continue
+            for bucket_queue_id, queue_bucket in queue_buckets.items():
+                if queue_id is not None and bucket_queue_id != "{0}".format(queue_id):
+                    continue
+                games_played += queue_bucket[bucket_gp_key]
+                for player_id, stats in queue_bucket[bucket_players_key].items():
+                    player_dict = players.setdefault(player_id, {})
+                    player_dict[player_points_key] = player_dict.get(player_points_key, 0) + stats[player_points_key]
+                    player_dict[player_gp_key] = player_dict.get(player_gp_key, 0) + stats[player_gp_key]
+                    player_dict[player_wins_key] = player_dict.get(player_wins_key, 0) + stats[player_wins_key]
+        return players, games_played
+
+    def prune(self, now: int):
+        """Drops buckets that have fallen outside of the longest leaderboard window."""
+        oldest_key = int(self.bucket_key(now)) - bucket_retention
+        for key in [key for key in self.buckets.keys() if int(key) < oldest_key]:
+            del self.buckets[key]
+
+    def _queue_bucket(self, key, queue_id):
+        queue_buckets = self.buckets.setdefault(key, {})
+        return queue_buckets.setdefault("{0}".format(queue_id), {bucket_gp_key: 0, bucket_players_key: {}})
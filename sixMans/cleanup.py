@@ -0,0 +1,76 @@
+import asyncio
+import collections
+import time
+from .game import gather_limited
+
+class ChannelCleanupWorker:
+    """Deletes the channels of finished games once they have been kept around for `delay` seconds.
+
+    Finished games wait in one first in first out list that a single task works through, since every game waits the same amount of time.
+    All the games that are due are cleaned up together: members still in their voice channels are moved to the guild's queue lobby
+    and then the channels are deleted, with at most `max_concurrent` requests sent at once.
+    """
+    def __init__(self, get_lobby, delay, max_concurrent):
+        self.get_lobby = get_lobby          # Coroutine function (guild) -> queue lobby voice channel or None
+        self.delay = delay
+        self.max_concurrent = max_concurrent
+        self.pending = collections.deque()  # (epoch time the game's channels are due to be deleted, game)
+        self.task = None
+        self.batch = None                   # The games currently being cleaned up
+
+    def schedule(self, game):
+        self.pending.append((time.time() + self.delay, game))
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run())
+
+    async def flush(self):
+        """Cleans up every pending game right away"""
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        if self.batch and not self.batch.done():
+            try:
+                await self.batch
+            except Exception:
+                pass
+        games = [game for _, game in self.pending]
+        self.pending.clear()
+        await self.clean_up(games)
+
+    async def run(self):
+        while self.pending:
+            # Games are added in the order they're due, so nothing can become due before the first one
+            delay = self.pending[0][0] - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            games = []
+            while self.pending and self.pending[0][0] <= time.time():
+                games.append(self.pending.popleft()[1])
+            self.batch = asyncio.ensure_future(self.clean_up(games))
+            try:
+                # Shielded so stopping this task (in flush) doesn't abandon the games it already took off the list
+                await asyncio.shield(self.batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+
+    async def clean_up(self, games):
+        lobbies = {}
+        for game in games:
+            if game.guild not in lobbies:
+                lobbies[game.guild] = await self.get_lobby(game.guild)
+
+        moves = []
+        for game in games:
+            lobby = lobbies[game.guild]
+            if lobby:
+                moves.extend(member.move_to(lobby) for vc in game.voiceChannels if vc for member in vc.members)
+        await gather_limited(moves, self.max_concurrent)
+
+        channels = [channel for game in games for channel in [game.textChannel] + list(game.voiceChannels) if channel]
+        await gather_limited([channel.delete() for channel in channels], self.max_concurrent)
+
+    async def move_members(self, members, vc):
+        await gather_limited([member.move_to(vc) for member in members], self.max_concurrent)
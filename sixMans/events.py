@@ -0,0 +1,54 @@
+import asyncio
+import collections
+
+GameEvent = collections.namedtuple("GameEvent", ["name", "game"])
+
+class GameEventBus:
+    """Fans game lifecycle events ("created", "teams picked", "ongoing", "game over", "cancelled") out to subscribers without making the game wait.
+
+    Every subscriber gets its own bounded queue that its own task works through in order. Publishing never blocks: once a
+    subscriber has `max_pending` events waiting, the oldest one is dropped for it, so a slow subscriber only falls behind itself.
+    """
+    def __init__(self, max_pending):
+        self.max_pending = max_pending
+        self.subscribers = {}               # subscriber -> (queue, delivery task)
+        self.dropped = {}                   # subscriber -> events dropped because it fell too far behind
+
+    def subscribe(self, subscriber, handler):
+        """Delivers every event to `handler`, a coroutine function (event). `subscriber` is only used to identify the subscription."""
+        if subscriber in self.subscribers:
+            return
+        queue = asyncio.Queue(maxsize=self.max_pending)
+        self.subscribers[subscriber] = (queue, asyncio.ensure_future(self._deliver(queue, handler)))
+        self.dropped[subscriber] = 0
+
+    def unsubscribe(self, subscriber):
+        queue, task = self.subscribers.pop(subscriber, (None, None))
+        if task:
+            task.cancel()
+        self.dropped.pop(subscriber, None)
+
+    def publish(self, name, game):
+        event = GameEvent(name, game)
+        for subscriber, (queue, _) in self.subscribers.items():
+            if queue.full():
+                queue.get_nowait()
+                self.dropped[subscriber] += 1
+            queue.put_nowait(event)
+
+    def close(self):
+        for subscriber in list(self.subscribers.keys()):
+            self.unsubscribe(subscriber)
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    async def _deliver(self, queue, handler):
+        while True:
+            event = await queue.get()
+            try:
+                await handler(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
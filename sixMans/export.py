@@ -0,0 +1,87 @@
+import csv
+import os
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+export_chunk_size = 50000                   # How many scores are written to an export file at a time
+score_columns = ["DateTime", "Queue", "Player", "Win", "Points"]
+file_extensions = {"parquet": "parquet", "arrow": "arrow", "csv": "csv"}
+
+def export_formats():
+    """The formats scores can be exported in here, best first. Parquet and Arrow need pyarrow to be installed."""
+    return ["parquet", "arrow", "csv"] if pyarrow else ["csv"]
+
+class ScoreExporter:
+    """Writes scores to a columnar file one chunk at a time so the full score history is never held in memory.
+
+    Columns are DateTime (epoch seconds), Queue (the queue id as text, it doesn't fit in 64 bits), Player, Win and Points.
+    Every method is blocking, so run them in an executor.
+    """
+    def __init__(self, path, file_format):
+        self.path = path
+        self.file_format = file_format
+        self.rows = 0
+        self._file = None
+        self._writer = None
+        if file_format == "csv":
+            self._file = open(path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(score_columns)
+        else:
+            self.schema = pyarrow.schema([
+                ("DateTime", pyarrow.timestamp("s")),
+                ("Queue", pyarrow.string()),
+                ("Player", pyarrow.int64()),
+                ("Win", pyarrow.bool_()),
+                ("Points", pyarrow.int32())
+            ])
+            if file_format == "parquet":
+                self._writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression="zstd")
+            else:
+                self._writer = pyarrow.ipc.new_file(path, self.schema)
+
+    def write(self, scores):
+        if not scores:
+            return
+        self.rows += len(scores)
+        if self.file_format == "csv":
+            self._writer.writerows([score[column] for column in score_columns] for score in scores)
+            return
+        batch = pyarrow.record_batch([
+            pyarrow.array([score["DateTime"] for score in scores], type=pyarrow.int64()).cast(pyarrow.timestamp("s")),
+            pyarrow.array(["{0}".format(score["Queue"]) for score in scores], type=pyarrow.string()),
+            pyarrow.array([score["Player"] for score in scores], type=pyarrow.int64()),
+            pyarrow.array([bool(score["Win"]) for score in scores], type=pyarrow.bool_()),
+            pyarrow.array([score["Points"] for score in scores], type=pyarrow.int32())
+        ], schema=self.schema)
+        if self.file_format == "parquet":
+            self._writer.write_table(pyarrow.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
+
+    def write_archive(self, scores, queue_id=None):
+        """Writes the scores of an archive file (or any other iterable of scores) in chunks"""
+        chunk = []
+        for score in scores:
+            if queue_id is not None and score["Queue"] != queue_id:
+                continue
+            chunk.append(score)
+            if len(chunk) >= export_chunk_size:
+                self.write(chunk)
+                chunk = []
+        self.write(chunk)
+
+    def close(self):
+        if self.file_format == "csv":
+            self._file.close()
+        else:
+            self._writer.close()
+
+def export_path(directory, name, file_format):
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, "{0}.{1}".format(name, file_extensions[file_format]))
@@ -1,9 +1,26 @@
 import discord
+import asyncio
+import copy
 import random
 import uuid
 import struct
+from .balance import balance_teams
 from .config import config
 
+max_concurrent_requests = 5     # How many Discord requests are sent at once when setting up or cleaning up games
+
+async def gather_limited(coroutines, max_concurrent=max_concurrent_requests):
+    """Runs the coroutines with at most `max_concurrent` of them awaiting at once. Exceptions are returned rather than raised,
+    so a player or channel that's already gone doesn't stop the rest."""
+    # discord.py waits out rate limits itself, this only keeps a burst of calls from all hitting the same bucket at once
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def limited(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*[limited(coroutine) for coroutine in coroutines], return_exceptions=True)
+
 class Game:
     def __init__(
             self, players, queue,
@@ -13,7 +30,7 @@ class Game:
             automove=False,
             text_channel: discord.TextChannel=None, 
             voice_channels=None,
-            observers=None):
+            events=None):
         self.id = uuid.uuid4().int
         self.players = set(players)
         self.captains = []
@@ -30,7 +47,7 @@ class Game:
         self.category = category
         self.helper_role = helper_role
         self.automove = automove
-        self.observers = observers if observers else []
+        self.events = events                # GameEventBus lifecycle events are published to
 
         self.teams_message = None
         if text_channel and voice_channels:
@@ -39,10 +56,6 @@ class Game:
         else:
             self.textChannel = None
             self.voiceChannels = None
-
-        # attatch listeners to game
-        for observer in self.observers:
-            observer._subject = self
     
     # @property
     # def subject_state(self):
@@ -51,74 +64,90 @@ class Game:
     async def _notify(self, new_state=None):
         if new_state:
             self.game_state = new_state
-        for observer in self.observers:
-            await observer.update(self)
+        self._publish(self.game_state)
+
+    def _publish(self, event_name):
+        # Subscribers get the event from their own queue, a slow one never holds up the game. They're given a snapshot of the
+        # game as it was when the event happened since it may have moved on by the time they get to it.
+        if not self.events or not len(self.events):
+            return
+        snapshot = copy.copy(self)
+        snapshot.game_state = event_name
+        snapshot.players = set(self.players)
+        snapshot.blue = set(self.blue)
+        snapshot.orange = set(self.orange)
+        snapshot.captains = list(self.captains)
+        self.events.publish(event_name, snapshot)
+
+    async def cancel(self):
+        await self._notify(new_state="cancelled")
 
     async def create_game_channels(self, six_mans_queue, category=None):
-        # sync permissions on channel creation, and edit overwrites (@everyone) immediately after
+        # build every overwrite up front so each channel is created with its final permissions in a single request,
+        # starting from the category's overwrites so the channels stay synced with it
         code = str(self.id)[-3:]
-        self.textChannel = await self.guild.create_text_channel(
-            "{} {} 6 Mans".format(code, six_mans_queue.name), 
-            permissions_synced=True,
-            category=category
-        )
-        await self.textChannel.set_permissions(self.guild.default_role, view_channel=False, read_messages=False)
+        base_overwrites = dict(category.overwrites) if category else {}
+
+        text_overwrites = dict(base_overwrites)
+        text_overwrites[self.guild.default_role] = discord.PermissionOverwrite(view_channel=False, read_messages=False)
         for player in self.players:
-            await self.textChannel.set_permissions(player, read_messages=True)
-        blue_vc = await self.guild.create_voice_channel("{} | {} Blue Team".format(code, six_mans_queue.name), permissions_synced=True, category=category)
-        await blue_vc.set_permissions(self.guild.default_role, connect=False)
-        oran_vc = await self.guild.create_voice_channel("{} | {} Orange Team".format(code, six_mans_queue.name), permissions_synced=True, category=category)
-        await oran_vc.set_permissions(self.guild.default_role, connect=False)
-        
+            text_overwrites[player] = discord.PermissionOverwrite(read_messages=True)
+
+        voice_overwrites = dict(base_overwrites)
+        voice_overwrites[self.guild.default_role] = discord.PermissionOverwrite(connect=False)
+
         # manually add helper role perms if there is not an associated 6mans category
         if self.helper_role and not category:
-            await text_channel.set_permissions(self.helper_role, view_channel=True, read_messages=True)
-            await blue_vc.set_permissions(self.helper_role, connect=True)
-            await oran_vc.set_permissions(self.helper_role, connect=True)
-        
+            text_overwrites[self.helper_role] = discord.PermissionOverwrite(view_channel=True, read_messages=True)
+            voice_overwrites[self.helper_role] = discord.PermissionOverwrite(connect=True)
+
+        self.textChannel, blue_vc, oran_vc = await asyncio.gather(
+            self.guild.create_text_channel("{} {} 6 Mans".format(code, six_mans_queue.name), overwrites=text_overwrites, category=category),
+            self.guild.create_voice_channel("{} | {} Blue Team".format(code, six_mans_queue.name), overwrites=voice_overwrites, category=category),
+            self.guild.create_voice_channel("{} | {} Orange Team".format(code, six_mans_queue.name), overwrites=voice_overwrites, category=category)
+        )
         self.voiceChannels = [blue_vc, oran_vc]
+        self._publish("created")
 
-    async def add_to_blue(self, player):
-        self.players.remove(player)
-        self.blue.add(player)
+    async def assign_teams(self, blue, orange):
+        """Sets both teams at once. Each team voice channel's overwrites are replaced in a single edit and players are moved
+        concurrently, instead of two permission calls and a move per player."""
+        self.blue = set(blue)
+        self.orange = set(orange)
+        self.reset_players()
 
         blue_vc, orange_vc = self.voiceChannels
-        await blue_vc.set_permissions(player, connect=True)
-        await orange_vc.set_permissions(player, connect=False)
+        blue_overwrites = dict(blue_vc.overwrites)
+        orange_overwrites = dict(orange_vc.overwrites)
+        for player in self.blue:
+            blue_overwrites[player] = discord.PermissionOverwrite(connect=True)
+            orange_overwrites[player] = discord.PermissionOverwrite(connect=False)
+        for player in self.orange:
+            blue_overwrites[player] = discord.PermissionOverwrite(connect=False)
+            orange_overwrites[player] = discord.PermissionOverwrite(connect=True)
+        await asyncio.gather(blue_vc.edit(overwrites=blue_overwrites), orange_vc.edit(overwrites=orange_overwrites))
 
         if self.automove:
-            try:
-                await player.move_to(blue_vc)
-            except:
-                pass
+            moves = [self._move_player(player, blue_vc) for player in self.blue]
+            moves += [self._move_player(player, orange_vc) for player in self.orange]
+            await gather_limited(moves)
+        self._publish("teams picked")
 
-    async def add_to_orange(self, player):
-        self.players.remove(player)
-        self.orange.add(player)
-
-        blue_vc, orange_vc = self.voiceChannels
-        await blue_vc.set_permissions(player, connect=False)
-        await orange_vc.set_permissions(player, connect=True)
-
-        if self.automove:
-            try:
-                await player.move_to(orange_vc)
-            except:
-                pass
+    async def _move_player(self, player, voice_channel):
+        try:
+            await player.move_to(voice_channel)
+        except:
+            pass
 
     async def pick_random_teams(self):
         await self.shuffle_players()
         await self._notify(new_state="ongoing")
 
     async def shuffle_players(self):
-        self.blue = set()
-        self.orange = set()
-        for player in random.sample(self.players, int(len(self.players)/2)):
-            await self.add_to_orange(player)
-        blue = [player for player in self.players]
-        for player in blue:
-            await self.add_to_blue(player)
         self.reset_players()
+        orange = random.sample(list(self.players), int(len(self.players)/2))
+        blue = [player for player in self.players if player not in orange]
+        await self.assign_teams(blue, orange)
         self.get_new_captains_from_teams()
 
     async def captains_pick_teams(self, helper_role):
@@ -186,13 +215,8 @@ class Game:
             await self.teams_message.edit(embed=embed)
         
         if teams_complete:
-            for player in self.blue:
-                await self.add_to_blue(player)
-            for player in self.orange:
-                await self.add_to_orange(player)
-            self.reset_players()
-        
-        await self._notify(new_state="ongoing")
+            await self.assign_teams(self.blue, self.orange)
+            await self._notify(new_state="ongoing")
         return teams_complete
 
     def _get_captains_embed(self, pick, guild=None):
@@ -280,8 +304,13 @@ class Game:
             players += "{} {}\n".format(react, player.mention)
         return players
 
-    async def pick_balanced_teams(self):
-        pass
+    async def pick_balanced_teams(self, ratings, balancer=None):
+        """Splits the players into the two teams with the closest total rating. `ratings` maps each player to their rating."""
+        self.reset_players()
+        blue, orange = balance_teams(list(self.players), ratings, balancer)
+        await self.assign_teams(blue, orange)
+        self.get_new_captains_from_teams()
+        await self._notify(new_state="ongoing")
 
     def reset_players(self):
         self.players.update(self.orange)
@@ -1,13 +1,18 @@
 import discord
+import bisect
 import collections
 import datetime
+import itertools
 import uuid
 from queue import Queue
 
 team_size = 6
+mm_spread_key = "Spread"
+mm_widen_key = "Widen"
+mm_max_wait_key = "MaxWait"
 
 class SixMansQueue:
-    def __init__(self, name, guild, channels, points, players, gamesPlayed):
+    def __init__(self, name, guild, channels, points, players, gamesPlayed, matchmaking=None):
         self.id = uuid.uuid4().int
         self.name = name
         self.queue = PlayerQueue()
@@ -17,10 +22,13 @@ class SixMansQueue:
         self.players = players
         self.gamesPlayed = gamesPlayed
         self.activeJoinLog = {}
+        self.matchmaking = matchmaking      # None for first come first served, otherwise {"Spread": rating, "Widen": rating per minute, "MaxWait": minutes}
+        self.ratings = RatingIndex()
 
-    def _put(self, player):
+    def _put(self, player, rating=None):
         self.queue.put(player)
         self.activeJoinLog[player.id] = datetime.datetime.now()
+        self.ratings.add(player, rating if rating is not None else 0)
 
     def _get(self):
         player = self.queue.get()
@@ -28,6 +36,7 @@ class SixMansQueue:
             del self.activeJoinLog[player.id]
         except:
             pass
+        self.ratings.discard(player)
         return player
 
     def _remove(self, player):
@@ -36,20 +45,129 @@ class SixMansQueue:
             del self.activeJoinLog[player.id]
         except:
             pass
+        self.ratings.discard(player)
 
     def _queue_full(self):
         return self.queue.qsize() >= team_size
 
+    def _pop_players(self):
+        """Removes and returns the players for the next game, or None if no group can be formed yet.
+        Without matchmaking this is the first `team_size` players to join, with it it's the best matched group that has waited long enough."""
+        if not self._queue_full():
+            return None
+        if not self.matchmaking:
+            return [self._get() for _ in range(team_size)]
+        players = self._find_match(datetime.datetime.now().timestamp())
+        if players:
+            for player in players:
+                self._remove(player)
+        return players
+
+    def _find_match(self, now):
+        """Finds the group with the smallest rating spread among those whose allowed spread has widened enough to include it.
+        The allowed spread grows with how long the longest waiting player in the group has been in the queue. Once the longest
+        waiting player in the whole queue has waited `MaxWait` minutes, only groups that include them are considered."""
+        overdue_player = self._overdue_player(now)
+        best_players = None
+        best_spread = None
+        for players, spread, oldest_join in self._match_windows():
+            if overdue_player is not None:
+                if overdue_player not in players:
+                    continue
+            elif now < self._window_ready_time(spread, oldest_join):
+                continue
+            if best_spread is None or spread < best_spread:
+                best_players, best_spread = players, spread
+        return best_players
+
+    def _overdue_player(self, now):
+        """The longest waiting player if they've waited at least `MaxWait` minutes, otherwise None"""
+        longest_waiting = next(iter(self.queue.queue), None)
+        join_time = self.activeJoinLog.get(longest_waiting.id) if longest_waiting is not None else None
+        if join_time and now >= join_time.timestamp() + self.matchmaking[mm_max_wait_key] * 60:
+            return longest_waiting
+        return None
+
+    def _next_match_time(self):
+        """The earliest epoch time a group could be formed at with the players in the queue right now, None if there aren't enough players"""
+        if not self.matchmaking or not self._queue_full():
+            return None
+        ready_times = [self._window_ready_time(spread, oldest_join) for _, spread, oldest_join in self._match_windows()]
+        return min(ready_times) if ready_times else None
+
+    def _match_windows(self):
+        # The group of players with the smallest rating spread is always a run of players next to each other in rating order
+        ordered = self.ratings.ordered()
+        for i in range(len(ordered) - team_size + 1):
+            window = ordered[i:i + team_size]
+            players = [player for _, _, player in window]
+            spread = window[-1][0] - window[0][0]
+            oldest_join = min((self.activeJoinLog[player.id].timestamp() for player in players if player.id in self.activeJoinLog), default=0)
+            yield players, spread, oldest_join
+
+    def _window_ready_time(self, spread, oldest_join):
+        base_spread = self.matchmaking[mm_spread_key]
+        widen_per_second = self.matchmaking[mm_widen_key] / 60
+        max_wait_time = oldest_join + self.matchmaking[mm_max_wait_key] * 60
+        if spread <= base_spread:
+            return oldest_join
+        if widen_per_second <= 0:
+            return max_wait_time
+        return min(oldest_join + (spread - base_spread) / widen_per_second, max_wait_time)
+
+    def _members_to_list(self):
+        """The players in the queue in the order they joined, as [player id, join time (epoch), matchmaking rating]"""
+        members = []
+        for player in self.queue.queue:
+            join_time = self.activeJoinLog.get(player.id)
+            rating = self.ratings.rating(player) if self.matchmaking else None
+            members.append([player.id, join_time.timestamp() if join_time else None, rating])
+        return members
+
+    def _restore_members(self, members):
+        """Puts players back in the queue with the join times they originally had. `members` is a list of (player, join time (epoch), rating)."""
+        for player, join_time, rating in members:
+            self._put(player, rating)
+            if join_time:
+                self.activeJoinLog[player.id] = datetime.datetime.fromtimestamp(join_time)
+
     def _to_dict(self):
         return {
             "Name": self.name,
             "Channels": [x.id for x in self.channels],
             "Points": self.points,
             "Players": self.players,
-            "GamesPlayed": self.gamesPlayed
+            "GamesPlayed": self.gamesPlayed,
+            "Matchmaking": self.matchmaking
         }
 
 
+class RatingIndex:
+    """Players currently in a queue, kept sorted by rating"""
+    def __init__(self):
+        self.entries = []           # [(rating, sequence, player)] sorted
+        self.player_entries = {}    # player -> entry
+        self.sequence = itertools.count()
+
+    def add(self, player, rating):
+        self.discard(player)
+        entry = (rating, next(self.sequence), player)
+        self.player_entries[player] = entry
+        bisect.insort(self.entries, entry)
+
+    def discard(self, player):
+        entry = self.player_entries.pop(player, None)
+        if entry:
+            del self.entries[bisect.bisect_left(self.entries, entry)]
+
+    def rating(self, player):
+        entry = self.player_entries.get(player)
+        return entry[0] if entry else None
+
+    def ordered(self):
+        return self.entries
+
+
 class PlayerQueue(Queue):
     def _init(self, maxsize):
         self.queue = OrderedSet()
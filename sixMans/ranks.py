@@ -0,0 +1,80 @@
+import bisect
+
+player_points_key = "Points"
+player_gp_key = "GamesPlayed"
+player_wins_key = "Wins"
+
+def _points_key(stats):
+    # Points ties are broken by wins, the same order the leaderboard uses
+    return (-stats.get(player_points_key, 0), -stats.get(player_wins_key, 0))
+
+def _wins_key(stats):
+    return -stats.get(player_wins_key, 0)
+
+def _gp_key(stats):
+    return -stats.get(player_gp_key, 0)
+
+class RankIndex:
+    """Keeps players' points, wins, and games played in sorted order so a player's ranks can be found with a binary search.
+    Tied players share the same rank."""
+    def __init__(self, players_dict):
+        self.players = {}
+        for player_id, stats in players_dict.items():
+            self.players[player_id] = self._copy_stats(stats)
+        self.points = sorted(_points_key(stats) for stats in self.players.values())
+        self.wins = sorted(_wins_key(stats) for stats in self.players.values())
+        self.games_played = sorted(_gp_key(stats) for stats in self.players.values())
+
+    def __len__(self):
+        return len(self.players)
+
+    def update(self, player_id, stats):
+        """Replaces a player's stats with their new totals"""
+        player_id = "{0}".format(player_id)
+        old_stats = self.players.get(player_id)
+        if old_stats is not None:
+            self._remove(self.points, _points_key(old_stats))
+            self._remove(self.wins, _wins_key(old_stats))
+            self._remove(self.games_played, _gp_key(old_stats))
+        new_stats = self._copy_stats(stats)
+        self.players[player_id] = new_stats
+        bisect.insort(self.points, _points_key(new_stats))
+        bisect.insort(self.wins, _wins_key(new_stats))
+        bisect.insort(self.games_played, _gp_key(new_stats))
+
+    def ranks(self, player_id):
+        """Returns (stats, points rank, wins rank, games played rank) for the player, or None if they haven't played"""
+        stats = self.players.get("{0}".format(player_id))
+        if stats is None:
+            return None
+        return (
+            stats,
+            bisect.bisect_left(self.points, _points_key(stats)) + 1,
+            bisect.bisect_left(self.wins, _wins_key(stats)) + 1,
+            bisect.bisect_left(self.games_played, _gp_key(stats)) + 1
+        )
+
+    @staticmethod
+    def _remove(keys, key):
+        del keys[bisect.bisect_left(keys, key)]
+
+    @staticmethod
+    def _copy_stats(stats):
+        return {
+            player_points_key: stats.get(player_points_key, 0),
+            player_wins_key: stats.get(player_wins_key, 0),
+            player_gp_key: stats.get(player_gp_key, 0)
+        }
+
+def count_ranks(players_dict, player_id):
+    """Single pass version of `RankIndex.ranks` for player dicts that are built on demand and only queried once"""
+    stats = players_dict.get("{0}".format(player_id))
+    if stats is None:
+        return None
+    points_key, wins_key, gp_key = _points_key(stats), _wins_key(stats), _gp_key(stats)
+    points_rank = wins_rank = gp_rank = 1
+    for other_stats in players_dict.values():
+        points_rank += _points_key(other_stats) < points_key
+        wins_rank += _wins_key(other_stats) < wins_key
+        gp_rank += _gp_key(other_stats) < gp_key
+    return stats, points_rank, wins_rank, gp_rank
@@ -0,0 +1,103 @@
+default_rating = 1000
+k_factor = 32
+
+def expected_score(rating, opponent_rating):
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+class QueueRatings:
+    """Team Elo ratings for the players of one queue.
+
+    Each team is rated as the average of its players. After a game every player on a team moves by the same amount,
+    k * (result - expected result). Stored compactly as {player_id: [rating, games rated]}.
+    """
+    def __init__(self, ratings=None):
+        self.ratings = ratings if ratings is not None else {}
+
+    def rating(self, player_id):
+        return self.ratings.get("{0}".format(player_id), [default_rating, 0])[0]
+
+    def games(self, player_id):
+        return self.ratings.get("{0}".format(player_id), [default_rating, 0])[1]
+
+    def update_game(self, winner_ids, loser_ids):
+        """Applies a game's result. Returns the rating change for the winners (the losers lose the same amount)."""
+        winner_ratings = [self.rating(player_id) for player_id in winner_ids]
+        loser_ratings = [self.rating(player_id) for player_id in loser_ids]
+        winner_average = sum(winner_ratings) / len(winner_ratings)
+        loser_average = sum(loser_ratings) / len(loser_ratings)
+        change = k_factor * (1 - expected_score(winner_average, loser_average))
+        for player_id, rating in zip(winner_ids, winner_ratings):
+            self._set(player_id, rating + change)
+        for player_id, rating in zip(loser_ids, loser_ratings):
+            self._set(player_id, rating - change)
+        return change
+
+    def sorted_players(self):
+        return sorted(self.ratings.items(), key=lambda x: x[1][0], reverse=True)
+
+    def _set(self, player_id, rating):
+        player_id = "{0}".format(player_id)
+        games = self.ratings.get(player_id, [default_rating, 0])[1]
+        self.ratings[player_id] = [round(rating, 1), games + 1]
+
+def score_game_key(score):
+    """What identifies the game a score was reported for. Scores saved before they carried their game's id fall back to their queue and time."""
+    game_id = score.get("Game")
+    if game_id is not None:
+        return game_id
+    return (score["DateTime"], score["Queue"])
+
+def replay_scores(scores):
+    """Rebuilds every queue's ratings from scratch from scores ordered oldest first.
+
+    Scores from the same game are next to each other and share a game key (see `score_game_key`). Ratings are kept in flat
+    lists indexed by a dense per-player number while replaying, and only turned back into the stored dicts at the end.
+    Returns {queue_id: {player_id: [rating, games]}}.
+    """
+    indexes = {}            # (queue_id, player_id) -> index into the lists below
+    keys = []
+    ratings = []
+    games = []
+
+    def index_of(key):
+        index = indexes.get(key)
+        if index is None:
+            index = indexes[key] = len(keys)
+            keys.append(key)
+            ratings.append(default_rating)
+            games.append(0)
+        return index
+
+    def apply(game_scores):
+        queue_id = "{0}".format(game_scores[0]["Queue"])
+        winners = [index_of((queue_id, "{0}".format(score["Player"]))) for score in game_scores if score["Win"]]
+        losers = [index_of((queue_id, "{0}".format(score["Player"]))) for score in game_scores if not score["Win"]]
+        if not winners or not losers:
+            return
+        winner_average = sum(ratings[i] for i in winners) / len(winners)
+        loser_average = sum(ratings[i] for i in losers) / len(losers)
+        change = k_factor * (1 - expected_score(winner_average, loser_average))
+        # Rounded the same way QueueRatings stores them so a replay matches the live ratings
+        for i in winners:
+            ratings[i] = round(ratings[i] + change, 1)
+            games[i] += 1
+        for i in losers:
+            ratings[i] = round(ratings[i] - change, 1)
+            games[i] += 1
+
+    game_scores = []
+    game_key = None
+    for score in scores:
+        score_key = score_game_key(score)
+        if game_scores and score_key != game_key:
+            apply(game_scores)
+            game_scores = []
+        game_key = score_key
+        game_scores.append(score)
+    if game_scores:
+        apply(game_scores)
+
+    queue_ratings = {}
+    for (queue_id, player_id), rating, games_rated in zip(keys, ratings, games):
+        queue_ratings.setdefault(queue_id, {})[player_id] = [rating, games_rated]
+    return queue_ratings
@@ -4,31 +4,52 @@ import operator
 import random
 import asyncio
 import datetime
+import itertools
+import logging
+import os
 import uuid
 
 from queue import Queue
 from redbot.core import Config
 from redbot.core import commands
 from redbot.core import checks
+from redbot.core.data_manager import cog_data_path
 from redbot.core.utils.predicates import ReactionPredicate
 from redbot.core.utils.menus import start_adding_reactions
 
-from .game import Game
-from .queue import SixMansQueue
+from .archive import archive_scores_key, read_archive, summarize_scores, write_archive
+from .buckets import ScoreBuckets, bucket_retention, bucket_size
+from .cleanup import ChannelCleanupWorker
+from .events import GameEventBus
+from .export import ScoreExporter, export_chunk_size, export_formats, export_path
+from .game import Game, max_concurrent_requests
+from .queue import SixMansQueue, mm_spread_key, mm_widen_key, mm_max_wait_key
+from .ranks import RankIndex, count_ranks
+from .ratings import QueueRatings, replay_scores, score_game_key
+from .state import GuildStateCache
+from .status import QueueStatusUpdater
+from .timeouts import QueueTimeoutScheduler
 
 debug = False
+log = logging.getLogger("red.sixMans")
+
 team_size = 6
 minimum_game_time = 600                     # Seconds (10 Minutes)
 player_timeout_time = 14400                 # How long players can be in a queue in seconds (4 Hours)
-loop_time = 5                               # How often to check the queues in seconds
 verify_timeout = 15                         # How long someone has to react to a prompt (seconds)
 channel_sleep_time = 5 if debug else 30     # How long channels will persist after a game's score has been reported (seconds)
+score_segment_size = 600                    # How many scores are stored in a single score segment (100 games)
+queue_status_interval = 5                   # How often a queue's status message can be edited (seconds)
+state_flush_delay = 10                      # How long queue, game, and score changes are held in memory before being saved (seconds)
+game_event_backlog = 100                    # How many game events an observer can fall behind by before the oldest are dropped
+minimum_archive_horizon = 31                # Scores newer than this can't be archived, they still count towards the monthly leaderboard (days)
 pp_play_key = "Play"
 pp_win_key = "Win"
 player_points_key = "Points"
 player_gp_key = "GamesPlayed"
 player_wins_key = "Wins"
 queues_key = "Queues"
+legacy_score_date_format = "%d-%b-%Y (%H:%M:%S.%f)"
 
 defaults = {
     "CategoryChannel": None,
@@ -38,9 +59,18 @@ defaults = {
     "DefaultTeamSelection": "random",
     "Games": {},
     "Queues": {},
+    "QueueMembers": {},                     # Snapshot of who is in each queue so queues survive restarts
     "GamesPlayed": 0,
     "Players": {},
-    "Scores": []
+    "Scores": [],                           # Legacy score storage, moved into ScoreSegments by migrateSixMansScores
+    "ScoreSegments": {},
+    "ScoreSegmentIndex": 0,
+    "ScoreSegmentStart": 0,
+    "ScoreArchiveHorizon": 180,
+    "ScoreArchives": [],
+    "ArchivedScoreTotals": {},
+    "ScoreBuckets": None,
+    "Ratings": {}
 }
 
 class SixMans(commands.Cog):
@@ -51,30 +81,65 @@ class SixMans(commands.Cog):
         self.config.register_guild(**defaults)
         self.queues = []
         self.games = []
+        self.queues_by_id = {}          # queue id -> queue
+        self.queues_by_channel = {}     # queue text channel id -> queue
+        self.games_by_channel = {}      # game text channel id -> game
+        self.player_queues = {}         # (guild id, member id) -> set of queues they're in
+        self.player_games = {}          # (guild id, member id) -> game they're in
+        self.forming_players = set()    # (guild id, member id) of members popped from a queue whose game is still being set up
+        self.queue_locks = {}           # queue id -> lock held while players are popped from the queue
+        self.rating_locks = {}          # guild id -> lock held while a game's rating change is applied or the ratings are replayed
+        self.score_locks = {}           # guild id -> lock held while legacy scores are migrated or scores are appended to a segment
+        self.loaded = asyncio.Event()
+        self.load_task = self.bot.loop.create_task(self._load_all_guilds())
+        self.timeouts = QueueTimeoutScheduler(self._timeout_player)
+        self.matchmaking_handles = {}   # queue id -> handle for the next matchmaking attempt
+        self.queue_last_actions = {}    # queue id -> (description, icon url, colour) of the last join or leave
+        self.queue_status = QueueStatusUpdater(self._format_queue_status, queue_status_interval)
+        self.channel_cleanup = ChannelCleanupWorker(self._get_q_lobby_vc, channel_sleep_time, max_concurrent_requests)
         self.task = self.bot.loop.create_task(self.timeout_queues())
         self.SHUFFLE_REACT = "\U0001F500" # :twisted_rightwards_arrows:
         self.WHITE_X_REACT = "\U0000274E" # :negative_squared_cross_mark:
         self.WHITE_CHECK_REACT = "\U00002705" # :white_check_mark:
         self.observers = set()
+        self.game_events = GameEventBus(game_event_backlog)
+        self.rank_indexes = {}
+        self.leaderboards = {}          # (guild id, queue id, leaderboard format) -> cached leaderboard
+        self.state = GuildStateCache(self.config, self._write_scores, state_flush_delay)
 
 
     def cog_unload(self):
         """Clean up when cog shuts down."""
         if self.task:
             self.task.cancel()
+        if self.load_task:
+            self.load_task.cancel()
+        for handle in self.matchmaking_handles.values():
+            handle.cancel()
+        self.matchmaking_handles.clear()
+        self.queue_status.clear()
+        self.game_events.close()
+        self.bot.loop.create_task(self.channel_cleanup.flush())
+        self.bot.loop.create_task(self.state.flush())
+
+    async def cog_before_invoke(self, ctx):
+        # Commands only read queues and games from memory, so they need to wait for them to be loaded once after startup
+        await self.loaded.wait()
 
     @commands.guild_only()
     @commands.command()
     @checks.admin_or_permissions(manage_guild=True)
     async def loadGames(self, ctx):
-        await self._pre_load_queues(ctx)
+        """Resyncs this server's queues and games with what has been saved. Players currently in a queue are kept in it."""
         msg = await ctx.send("{0} Please verify that you wish to reload the games.".format(ctx.author.mention))
         start_adding_reactions(msg, ReactionPredicate.YES_OR_NO_EMOJIS)
 
         pred = ReactionPredicate.yes_or_no(msg, ctx.author)
         await ctx.bot.wait_for("reaction_add", check=pred)
         if pred.result is True:
-            await self._pre_load_games(ctx, True)
+            await self.state.reload(ctx.guild)
+            self._clear_leaderboards(ctx.guild)
+            await self._load_guild(ctx.guild)
             await ctx.send("Done")
         else:
             await ctx.send(":x: Games **not** reloaded.")
@@ -89,20 +154,126 @@ class SixMans(commands.Cog):
         pred = ReactionPredicate.yes_or_no(msg, ctx.author)
         await ctx.bot.wait_for("reaction_add", check=pred)
         if pred.result is True:
+            self.state.clear()
             await self.config.clear_all_guilds()
+            self.queues = []
+            self.games = []
+            self._index_queues()
+            self._index_games()
+            self.timeouts.clear()
+            self.rank_indexes = {}
+            self.leaderboards = {}
             await ctx.send("Done")
         else:
             await ctx.send(":x: Data **not** cleared.")
 
+    @commands.guild_only()
+    @commands.command()
+    @checks.admin_or_permissions(manage_guild=True)
+    async def recomputeRatings(self, ctx):
+        """Rebuilds every queue's ratings from scratch by replaying all of the scores that have been reported, archived scores included"""
+        msg = await ctx.send("{0} Please verify that you wish to recompute all 6 mans ratings.".format(ctx.author.mention))
+        start_adding_reactions(msg, ReactionPredicate.YES_OR_NO_EMOJIS)
+
+        pred = ReactionPredicate.yes_or_no(msg, ctx.author)
+        await ctx.bot.wait_for("reaction_add", check=pred)
+        if pred.result is True:
+            ratings = await self._replay_ratings(ctx.guild)
+            await ctx.send("Done. Recomputed ratings for **{0}** players.".format(sum(len(queue_ratings) for queue_ratings in ratings.values())))
+        else:
+            await ctx.send(":x: Ratings **not** recomputed.")
+
+    @commands.guild_only()
+    @commands.command()
+    @checks.admin_or_permissions(manage_guild=True)
+    async def migrateSixMansScores(self, ctx):
+        """Moves scores saved in the legacy format into the append-only score segments.
+        This also happens automatically the first time a score is saved or read, but can take a while for large leagues."""
+        migrated = await self._migrate_scores(ctx.guild)
+        if migrated:
+            await ctx.send("Done. Migrated **{0}** scores.".format(migrated))
+        else:
+            await ctx.send("There are no legacy scores to migrate.")
+
+    @commands.guild_only()
+    @commands.command()
+    @checks.admin_or_permissions(manage_guild=True)
+    async def setScoreArchiveHorizon(self, ctx, days: int):
+        """Sets how old (in days) scores need to be before `archiveScores` moves them out of the bot's live storage (Default: 180)"""
+        if days < minimum_archive_horizon:
+            await ctx.send(":x: The archive horizon must be at least **{0}** days.".format(minimum_archive_horizon))
+            return
+        await self.config.guild(ctx.guild).ScoreArchiveHorizon.set(days)
+        await ctx.send("Done")
+
+    @commands.guild_only()
+    @commands.command()
+    @checks.admin_or_permissions(manage_guild=True)
+    async def getScoreArchiveHorizon(self, ctx):
+        """Gets how old (in days) scores need to be before they can be archived"""
+        horizon = await self.config.guild(ctx.guild).ScoreArchiveHorizon()
+        await ctx.send("Scores older than **{0}** days will be archived.".format(horizon))
+
+    @commands.guild_only()
+    @commands.command()
+    @checks.admin_or_permissions(manage_guild=True)
+    async def archiveScores(self, ctx):
+        """Moves scores older than the archive horizon into a compressed archive file and keeps only their per-player totals in storage.
+        All-time leaderboards and ranks are not affected."""
+        horizon = await self.config.guild(ctx.guild).ScoreArchiveHorizon()
+        msg = await ctx.send("{0} Please verify that you wish to archive all scores older than **{1}** days.".format(ctx.author.mention, horizon))
+        start_adding_reactions(msg, ReactionPredicate.YES_OR_NO_EMOJIS)
+
+        pred = ReactionPredicate.yes_or_no(msg, ctx.author)
+        await ctx.bot.wait_for("reaction_add", check=pred)
+        if pred.result is True:
+            archived = await self._archive_scores(ctx.guild, horizon)
+            archived_totals = await self.config.guild(ctx.guild).ArchivedScoreTotals()
+            total_archived = sum(queue_totals[archive_scores_key] for totals in archived_totals.values() for queue_totals in totals.values())
+            await ctx.send("Done. Archived **{0}** scores, **{1}** scores are archived in total.".format(archived, total_archived))
+        else:
+            await ctx.send(":x: Scores **not** archived.")
+
+    @commands.guild_only()
+    @commands.command()
+    @checks.admin_or_permissions(manage_guild=True)
+    async def exportScores(self, ctx, file_format: str = None, *, queue_name: str = None):
+        """Exports the full score history, archived scores included, to a file for analysing offline.
+        Formats are parquet, arrow, and csv (parquet and arrow need pyarrow installed). Only one queue's scores are exported if a queue name is given."""
+        formats = export_formats()
+        if file_format is None:
+            file_format = formats[0]
+        file_format = file_format.lower()
+        if file_format not in ["parquet", "arrow", "csv"]:
+            await ctx.send(":x: Unknown export format: {0}. Use one of: {1}".format(file_format, ", ".join(formats)))
+            return
+        if file_format not in formats:
+            await ctx.send("{0} exports aren't available here, exporting as csv instead.".format(file_format))
+            file_format = "csv"
+
+        queue_id = None
+        if queue_name is not None:
+            queue_id = self._get_queue_id_by_name(ctx, queue_name)
+            if queue_id is None:
+                await ctx.send(":x: No queue set up with name: {0}".format(queue_name))
+                return
+
+        await ctx.send("Exporting scores...")
+        path, rows = await self._export_scores(ctx.guild, file_format, queue_id)
+        if os.path.getsize(path) <= ctx.guild.filesize_limit:
+            await ctx.send("Done. Exported **{0}** scores.".format(rows), file=discord.File(path))
+            os.remove(path)
+        else:
+            await ctx.send("Done. Exported **{0}** scores. The file is too large to upload, it has been saved to `{1}`".format(rows, path))
+
     @commands.guild_only()
     @commands.command()
     @checks.admin_or_permissions(manage_guild=True)
     async def addNewQueue(self, ctx, name, points_per_play: int, points_per_win: int, *channels):
-        await self._pre_load_queues(ctx)
         queue_channels = []
         for channel in channels:
             queue_channels.append(await commands.TextChannelConverter().convert(ctx, channel))
-        for queue in self.queues:
+        for queue in self._guild_queues(ctx.guild):
             if queue.name == name:
                 await ctx.send(":x: There is already a queue set up with the name: {0}".format(name))
                 return
@@ -114,6 +285,7 @@ class SixMans(commands.Cog):
         points = {pp_play_key: points_per_play, pp_win_key: points_per_win}
         six_mans_queue = SixMansQueue(name, ctx.guild, queue_channels, points, {}, 0)
         self.queues.append(six_mans_queue)
+        self._index_queues()
         await self._save_queues(ctx.guild, self.queues)
         await ctx.send("Done")
 
@@ -121,9 +293,8 @@ class SixMans(commands.Cog):
     @commands.command()
     @checks.admin_or_permissions(manage_guild=True)
     async def editQueue(self, ctx, current_name, new_name, points_per_play: int, points_per_win: int, *channels):
-        await self._pre_load_queues(ctx)
         six_mans_queue = None
-        for queue in self.queues:
+        for queue in self._guild_queues(ctx.guild):
             if queue.name == current_name:
                 six_mans_queue = queue
                 break
@@ -135,7 +306,7 @@ class SixMans(commands.Cog):
         queue_channels = []
         for channel in channels:
             queue_channels.append(await commands.TextChannelConverter().convert(ctx, channel))
-        for queue in self.queues:
+        for queue in self._guild_queues(ctx.guild):
             if queue.name != current_name:
                 if queue.name == new_name:
                     await ctx.send(":x: There is already a queue set up with the name: {0}".format(new_name))
@@ -149,6 +320,7 @@ class SixMans(commands.Cog):
         six_mans_queue.name = new_name
         six_mans_queue.points = {pp_play_key: points_per_play, pp_win_key: points_per_win}
         six_mans_queue.channels = queue_channels
+        self._index_queues()
         await self._save_queues(ctx.guild, self.queues)
         await ctx.send("Done")
 
@@ -156,19 +328,56 @@ class SixMans(commands.Cog):
     @commands.command()
     @checks.admin_or_permissions(manage_guild=True)
     async def removeQueue(self, ctx, *, queue_name):
-        await self._pre_load_queues(ctx)
-        for queue in self.queues:
+        for queue in self._guild_queues(ctx.guild):
             if queue.name == queue_name:
                 self.queues.remove(queue)
+                self._index_queues()
                 await self._save_queues(ctx.guild, self.queues)
                 await ctx.send("Done")
                 return
         await ctx.send(":x: No queue set up with name: {0}".format(queue_name))
 
+    @commands.guild_only()
+    @commands.command(aliases=["setMatchmaking"])
+    @checks.admin_or_permissions(manage_guild=True)
+    async def setQueueMatchmaking(self, ctx, queue_name, spread: float, widen_per_minute: float, max_wait_minutes: int):
+        """Makes a queue form games from the players with the closest ratings instead of the first six to join.
+
+        - **spread**: the largest rating gap between the best and worst player in a game that is allowed right away
+        - **widen_per_minute**: how much the allowed gap grows for every minute the longest waiting player has been in the queue
+        - **max_wait_minutes**: after this long, the longest waiting player is put into the best game available regardless of the gap
+        """
+        six_mans_queue = next((queue for queue in self._guild_queues(ctx.guild) if queue.name.lower() == queue_name.lower()), None)
+        if six_mans_queue is None:
+            await ctx.send(":x: No queue set up with name: {0}".format(queue_name))
+            return
+
+        six_mans_queue.matchmaking = {mm_spread_key: spread, mm_widen_key: widen_per_minute, mm_max_wait_key: max_wait_minutes}
+        for player in list(six_mans_queue.queue.queue):
+            six_mans_queue.ratings.add(player, await self._matchmaking_rating(six_mans_queue, player))
+        await self._save_queues(ctx.guild, self.queues)
+        self._schedule_matchmaking(six_mans_queue)
+        await ctx.send("Done")
+
+    @commands.guild_only()
+    @commands.command(aliases=["unsetMatchmaking"])
+    @checks.admin_or_permissions(manage_guild=True)
+    async def unsetQueueMatchmaking(self, ctx, *, queue_name):
+        """Makes a queue go back to forming games from the first six players to join"""
+        six_mans_queue = next((queue for queue in self._guild_queues(ctx.guild) if queue.name.lower() == queue_name.lower()), None)
+        if six_mans_queue is None:
+            await ctx.send(":x: No queue set up with name: {0}".format(queue_name))
+            return
+
+        six_mans_queue.matchmaking = None
+        self._schedule_matchmaking(six_mans_queue)
+        await self._save_queues(ctx.guild, self.queues)
+        await self._form_games(six_mans_queue)
+        await ctx.send("Done")
+
     @commands.guild_only()
     @commands.command(aliases=["qn"])
     async def getQueueNames(self, ctx):
-        await self._pre_load_queues(ctx)
         queue_names = ""
         for queue in self.queues:
             if queue.guild == ctx.guild:
@@ -178,9 +387,8 @@ class SixMans(commands.Cog):
     @commands.guild_only()
     @commands.command(aliases=["qi"])
     async def getQueueInfo(self, ctx, *, queue_name=None):
-        await self._pre_load_queues(ctx)
         if queue_name is not None:
-            for queue in self.queues:
+            for queue in self._guild_queues(ctx.guild):
                 if queue.name.lower() == queue_name.lower():
                     await ctx.send(embed=self._format_queue_info(ctx, queue))
                     return
@@ -197,13 +405,13 @@ class SixMans(commands.Cog):
     @commands.guild_only()
     @commands.command(aliases=["cq", "status"])
     async def checkQueue(self, ctx):
-        await self._pre_load_queues(ctx)
         six_mans_queue = self._get_queue(ctx)
         if six_mans_queue is None:
             await ctx.send(":x: No queue set up in this channel")
             return
         
-        await ctx.send(embed=self._format_queue(ctx, six_mans_queue))
+        message = await ctx.send(embed=self._format_queue(ctx, six_mans_queue))
+        self.queue_status.track(ctx.channel, message)
 
     @commands.guild_only()
     @commands.command(aliases=["setQueueLobby"])
@@ -222,7 +430,7 @@ class SixMans(commands.Cog):
     @commands.guild_only()
     @commands.command(aliases=["smMove", "moveme"])
     async def moveMe(self, ctx):
-        if ctx.message.channel.category != await self._category(ctx):
+        if ctx.message.channel.category != await self._category(ctx.guild):
             return False
 
         game = self._get_game(ctx)
@@ -247,44 +455,54 @@ class SixMans(commands.Cog):
     @commands.command(aliases=["qa"])
     @checks.admin_or_permissions(manage_guild=True)
     async def queueAll(self, ctx, *members: discord.Member):
-        """Mass queueing for testing purposes"""
-        await self._pre_load_queues(ctx)
-        await self._pre_load_games(ctx, False)
+        """Mass queueing for testing purposes and for seeding events. Every game the added players fill is created right away."""
         six_mans_queue = self._get_queue(ctx)
+        if six_mans_queue is None:
+            await ctx.send(":x: No queue set up in this channel")
+            return
+
+        players = []
+        skipped = []
         for member in members:
-            if member in six_mans_queue.queue.queue:
-                await ctx.send("{} is already in queue.".format(member.display_name))
-                break
-            await self._add_to_queue(member, six_mans_queue)
-        if six_mans_queue._queue_full():
-            await self._select_teams(ctx, six_mans_queue)
+            if member in six_mans_queue.queue.queue or self._in_game(member) or member in players:
+                skipped.append(member)
+            else:
+                players.append(member)
+        ratings = [await self._matchmaking_rating(six_mans_queue, player) for player in players]
+        self._add_players_to_queue(players, six_mans_queue, ratings)
+
+        message = "Added **{0}** player(s) to the {1} queue.".format(len(players), six_mans_queue.name)
+        if skipped:
+            message += "\nAlready in the queue or a game: {0}".format(", ".join(member.display_name for member in skipped))
+        await ctx.send(message)
+
+        games_created = await self._form_games(six_mans_queue)
+        if games_created:
+            await ctx.send("Created **{0}** game(s) from the {1} queue.".format(games_created, six_mans_queue.name))
+        self._schedule_matchmaking(six_mans_queue)
 
     @commands.guild_only()
     @commands.command(aliases=["queue"])
     async def q(self, ctx):
         """Add yourself to the queue"""
-        await self._pre_load_queues(ctx)
-        await self._pre_load_games(ctx, False)
         six_mans_queue = self._get_queue(ctx)
         player = ctx.message.author
 
         if player in six_mans_queue.queue.queue:
             await ctx.send(":x: You are already in the {0} queue".format(six_mans_queue.name))
             return
-        for game in self.games:
-            if player in game:
-                await ctx.send(":x: You are already in a game")
-                return
+        if self._in_game(player):
+            await ctx.send(":x: You are already in a game")
+            return
 
-        await self._add_to_queue(player, six_mans_queue)
-        if six_mans_queue._queue_full():
-            await self._select_teams(ctx, six_mans_queue)
+        await self._add_to_queue(player, six_mans_queue, await self._matchmaking_rating(six_mans_queue, player))
+        await self._form_games(six_mans_queue)
+        self._schedule_matchmaking(six_mans_queue)
 
     @commands.guild_only()
     @commands.command(aliases=["dq", "lq", "leaveq", "leaveQ", "unqueue", "unq", "uq"])
     async def dequeue(self, ctx):
         """Remove yourself from the queue"""
-        await self._pre_load_queues(ctx)
         six_mans_queue = self._get_queue(ctx)
         player = ctx.message.author
 
@@ -300,7 +518,6 @@ class SixMans(commands.Cog):
         if not await self.has_perms(ctx):
             return
 
-        await self._pre_load_queues(ctx)
         six_mans_queue = self._get_queue(ctx)
         if player in six_mans_queue.queue:
             await self._remove_from_queue(player, six_mans_queue)
@@ -312,8 +529,6 @@ class SixMans(commands.Cog):
     async def cancelGame(self, ctx):
         """Cancel the current 6Mans game. Can only be used in a 6Mans game channel.
         The game will end with no points given to any of the players. The players with then be allowed to queue again."""
-        await self._pre_load_queues(ctx)
-        await self._pre_load_games(ctx, False)
         game, six_mans_queue = await self._get_info(ctx)
         if game is None or six_mans_queue is None:
             return
@@ -331,6 +546,7 @@ class SixMans(commands.Cog):
             await ctx.bot.wait_for("reaction_add", check=pred, timeout=verify_timeout)
             if pred.result is True:
                 await ctx.send("Done. Feel free to queue again in an appropriate channel.\n**This channel will be deleted in {} seconds**".format(channel_sleep_time))
+                await game.cancel()
                 await self._remove_game(ctx, game)
             else:
                 await ctx.send(":x: Cancel not verified. To cancel the game you will need to use the `{0}cg` command again.".format(ctx.prefix))
@@ -347,17 +563,16 @@ class SixMans(commands.Cog):
         if not await self.has_perms(ctx):
             return
         
-        await self._pre_load_queues(ctx)
-        await self._pre_load_games(ctx, False)
         game = None
         if gameId is None:
             game, six_mans_queue = await self._get_info(ctx)
             if game is None or six_mans_queue is None:
                 return
         else:
-            for active_game in self.games:
+            for active_game in self._guild_games(ctx.guild):
                 if active_game.id == gameId:
                     game = active_game
+                    break
 
         if not game:
             await ctx.send("No game found with id: {}".format(gameId))
@@ -377,6 +592,7 @@ class SixMans(commands.Cog):
                     await game.textChannel.send("Game canceled by {}. Feel free to queue again in an appropriate channel.\n**This game's channels will be deleted in {} seconds**".format(ctx.author.mention, channel_sleep_time))
                 except:
                     await ctx.send("Game canceled by {}. Feel free to queue again in an appropriate channel.\n**This game's channels will be deleted in {} seconds**".format(ctx.author.mention, channel_sleep_time))
+                await game.cancel()
                 await self._remove_game(ctx, game)
             else:
                 await ctx.send(":x: Cancel not verified. To cancel the game you will need to use the `{0}cg` command again.".format(ctx.prefix))
@@ -389,8 +605,6 @@ class SixMans(commands.Cog):
         if not await self.has_perms(ctx):
             return
 
-        await self._pre_load_queues(ctx)
-        await self._pre_load_games(ctx, False)
         if winning_team.lower() != "blue" and winning_team.lower() != "orange":
             await ctx.send(":x: {0} is an invalid input for `winning_team`. Must be either `Blue` or `Orange`".format(winning_team))
             return
@@ -423,8 +637,6 @@ class SixMans(commands.Cog):
         Only valid after 10 minutes have passed since the game started. Both teams will need to verify the results.
 
         `winning_team` must be either `Blue` or `Orange`"""
-        await self._pre_load_queues(ctx)
-        await self._pre_load_games(ctx, False)
         game_time = ctx.message.created_at - ctx.channel.created_at
         if game_time.seconds < minimum_game_time:
             await ctx.send(":x: You can't report a game outcome until at least **10 minutes** have passed since the game was created."
@@ -483,82 +695,86 @@ class SixMans(commands.Cog):
     @queueLeaderBoard.command(aliases=["all-time", "alltime"])
     async def overall(self, ctx, *, queue_name: str = None):
         """All-time leader board"""
-        await self._pre_load_queues(ctx)
-        players = None
+        leaderboard = None
         if queue_name is not None:
-            for queue in self.queues:
+            for queue in self._guild_queues(ctx.guild):
                 if queue.name.lower() == queue_name.lower():
                     queue_name = queue.name
-                    players = queue.players
-                    games_played = queue.gamesPlayed
+                    leaderboard = await self._leaderboard(ctx, queue.id, "All-time")
         else:
-            players = await self._players(ctx)
             queue_name = ctx.guild.name
-            games_played = await self._games_played(ctx)
+            leaderboard = await self._leaderboard(ctx, None, "All-time")
 
-        if players is None or players == {}:
+        if leaderboard is None:
             await ctx.send(":x: Queue leaderboard not available for {0}".format(queue_name))
             return
 
-        sorted_players = self._sort_player_dict(players)
-        await ctx.send(embed=await self._format_leaderboard(ctx, sorted_players, queue_name, games_played, "All-time"))
+        await ctx.send(embed=self._format_leaderboard(ctx, leaderboard, queue_name, "All-time"))
 
     @commands.guild_only()
     @queueLeaderBoard.command(aliases=["daily"])
     async def day(self, ctx, *, queue_name: str = None):
         """Daily leader board. All games from the last 24 hours will count"""
-        await self._pre_load_queues(ctx)
-        scores = await self._scores(ctx)
-
-        queue_id = self._get_queue_id_by_name(queue_name)
+        queue_id = self._get_queue_id_by_name(ctx, queue_name)
         day_ago = datetime.datetime.now() - datetime.timedelta(days=1)
-        players, games_played = self._filter_scores(scores, day_ago, queue_id)
+        leaderboard = await self._leaderboard(ctx, queue_id, "Daily", day_ago)
 
-        if players is None or players == {}:
+        if leaderboard is None:
             await ctx.send(":x: Queue leaderboard not available for {0}".format(queue_name))
             return
 
         queue_name = self._get_queue_name(ctx, queue_name)
-        sorted_players = self._sort_player_dict(players)
-        await ctx.send(embed=await self._format_leaderboard(ctx, sorted_players, queue_name, games_played, "Daily"))
+        await ctx.send(embed=self._format_leaderboard(ctx, leaderboard, queue_name, "Daily"))
 
     @commands.guild_only()
     @queueLeaderBoard.command(aliases=["weekly", "wk"])
     async def week(self, ctx, *, queue_name: str = None):
         """Weekly leader board. All games from the last week will count"""
-        await self._pre_load_queues(ctx)
-        scores = await self._scores(ctx)
-
-        queue_id = self._get_queue_id_by_name(queue_name)
+        queue_id = self._get_queue_id_by_name(ctx, queue_name)
         week_ago = datetime.datetime.now() - datetime.timedelta(weeks=1)
-        players, games_played = self._filter_scores(scores, week_ago, queue_id)
+        leaderboard = await self._leaderboard(ctx, queue_id, "Weekly", week_ago)
 
-        if players is None or players == {}:
+        if leaderboard is None:
             await ctx.send(":x: Queue leaderboard not available for {0}".format(queue_name))
             return
 
         queue_name = self._get_queue_name(ctx, queue_name)
-        sorted_players = self._sort_player_dict(players)
-        await ctx.send(embed=await self._format_leaderboard(ctx, sorted_players, queue_name, games_played, "Weekly"))
+        await ctx.send(embed=self._format_leaderboard(ctx, leaderboard, queue_name, "Weekly"))
 
     @commands.guild_only()
     @queueLeaderBoard.command(aliases=["monthly", "mnth"])
     async def month(self, ctx, *, queue_name: str = None):
         """Monthly leader board. All games from the last 30 days will count"""
-        await self._pre_load_queues(ctx)
-        scores = await self._scores(ctx)
-
-        queue_id = self._get_queue_id_by_name(queue_name)
+        queue_id = self._get_queue_id_by_name(ctx, queue_name)
         month_ago = datetime.datetime.now() - datetime.timedelta(days=30)
-        players, games_played = self._filter_scores(scores, month_ago, queue_id)
+        leaderboard = await self._leaderboard(ctx, queue_id, "Monthly", month_ago)
 
-        if players is None or players == {}:
+        if leaderboard is None:
             await ctx.send(":x: Queue leaderboard not available for {0}".format(queue_name))
             return
 
         queue_name = self._get_queue_name(ctx, queue_name)
-        sorted_players = self._sort_player_dict(players)
-        await ctx.send(embed=await self._format_leaderboard(ctx, sorted_players, queue_name, games_played, "Monthly"))
+        await ctx.send(embed=self._format_leaderboard(ctx, leaderboard, queue_name, "Monthly"))
+
+    @commands.guild_only()
+    @queueLeaderBoard.command(aliases=["elo", "ratings"])
+    async def rating(self, ctx, *, queue_name: str = None):
+        """Rating leader board. Ratings are kept per queue, so if no queue name is given the queue for this channel is used"""
+        if queue_name is not None:
+            six_mans_queue = next((queue for queue in self._guild_queues(ctx.guild) if queue.name.lower() == queue_name.lower()), None)
+        else:
+            six_mans_queue = self._get_queue(ctx)
+        if six_mans_queue is None:
+            await ctx.send(":x: Rating leaderboard not available for {0}".format(queue_name if queue_name else "this channel"))
+            return
+
+        queue_ratings = await self._queue_ratings(ctx.guild, six_mans_queue.id)
+        sorted_players = queue_ratings.sorted_players()
+        if not sorted_players:
+            await ctx.send(":x: Rating leaderboard not available for {0}".format(six_mans_queue.name))
+            return
+
+        await ctx.send(embed=self._format_rating_leaderboard(ctx, sorted_players, six_mans_queue.name))
 
     @commands.guild_only()
     @commands.group(aliases=["rnk"])
@@ -569,12 +785,13 @@ class SixMans(commands.Cog):
     @rank.command(aliases=["all-time", "overall"])
     async def alltime(self, ctx, player: discord.Member = None, *, queue_name: str = None):
         """All-time ranks"""
-        await self._pre_load_queues(ctx)
         players = None
+        queue_id = None
         if queue_name is not None:
-            for queue in self.queues:
+            for queue in self._guild_queues(ctx.guild):
                 if queue.name.lower() == queue_name.lower():
                     queue_name = queue.name
+                    queue_id = queue.id
                     players = queue.players
         else:
             players = await self._players(ctx)
@@ -584,76 +801,64 @@ class SixMans(commands.Cog):
             await ctx.send(":x: Player ranks not available for {0}".format(queue_name))
             return
 
-        sorted_players = self._sort_player_dict(players)
+        rank_index = self._rank_index(ctx.guild, queue_id, players)
         player = player if player else ctx.author
-        await ctx.send(embed=self._format_rank(ctx, player, sorted_players, queue_name, "All-time"))
+        await ctx.send(embed=self._format_rank(ctx, player, rank_index.ranks(player.id), len(rank_index), queue_name, "All-time"))
 
     @commands.guild_only()
     @rank.command(aliases=["day"])
     async def daily(self, ctx, player: discord.Member = None, *, queue_name: str = None):
         """Daily ranks. All games from the last 24 hours will count"""
-        await self._pre_load_queues(ctx)
-        scores = await self._scores(ctx)
-
-        queue_id = self._get_queue_id_by_name(queue_name)
+        queue_id = self._get_queue_id_by_name(ctx, queue_name)
         day_ago = datetime.datetime.now() - datetime.timedelta(days=1)
-        players = self._filter_scores(scores, day_ago, queue_id)[0]
+        players = (await self._filter_score_buckets(ctx.guild, day_ago, queue_id))[0]
 
         if players is None or players == {}:
             await ctx.send(":x: Player ranks not available for {0}".format(queue_name))
             return
 
         queue_name = self._get_queue_name(ctx, queue_name)
-        sorted_players = self._sort_player_dict(players)
         player = player if player else ctx.author
-        await ctx.send(embed=self._format_rank(ctx, player, sorted_players, queue_name, "Daily"))
+        await ctx.send(embed=self._format_rank(ctx, player, count_ranks(players, player.id), len(players), queue_name, "Daily"))
 
     @commands.guild_only()
     @rank.command(aliases=["week", "wk"])
     async def weekly(self, ctx, player: discord.Member = None, *, queue_name: str = None):
         """Weekly ranks. All games from the last week will count"""
-        await self._pre_load_queues(ctx)
-        scores = await self._scores(ctx)
-
-        queue_id = self._get_queue_id_by_name(queue_name)
+        queue_id = self._get_queue_id_by_name(ctx, queue_name)
         week_ago = datetime.datetime.now() - datetime.timedelta(weeks=1)
-        players = self._filter_scores(scores, week_ago, queue_id)[0]
+        players = (await self._filter_score_buckets(ctx.guild, week_ago, queue_id))[0]
 
         if players is None or players == {}:
             await ctx.send(":x: Player ranks not available for {0}".format(queue_name))
             return
 
         queue_name = self._get_queue_name(ctx, queue_name)
-        sorted_players = self._sort_player_dict(players)
         player = player if player else ctx.author
-        await ctx.send(embed=self._format_rank(ctx, player, sorted_players, queue_name, "Weekly"))
+        await ctx.send(embed=self._format_rank(ctx, player, count_ranks(players, player.id), len(players), queue_name, "Weekly"))
 
     @commands.guild_only()
     @rank.command(aliases=["month", "mnth"])
     async def monthly(self, ctx, player: discord.Member = None, *, queue_name: str = None):
         """Monthly ranks. All games from the last 30 days will count"""
-        await self._pre_load_queues(ctx)
-        scores = await self._scores(ctx)
-
-        queue_id = self._get_queue_id_by_name(queue_name)
+        queue_id = self._get_queue_id_by_name(ctx, queue_name)
         month_ago = datetime.datetime.now() - datetime.timedelta(days=30)
-        players = self._filter_scores(scores, month_ago, queue_id)[0]
+        players = (await self._filter_score_buckets(ctx.guild, month_ago, queue_id))[0]
 
         if players is None or players == {}:
             await ctx.send(":x: Player ranks not available for {0}".format(queue_name))
             return
 
         queue_name = self._get_queue_name(ctx, queue_name)
-        sorted_players = self._sort_player_dict(players)
         player = player if player else ctx.author
-        await ctx.send(embed=self._format_rank(ctx, player, sorted_players, queue_name, "Monthly"))
+        await ctx.send(embed=self._format_rank(ctx, player, count_ranks(players, player.id), len(players), queue_name, "Monthly"))
 
     @commands.guild_only()
     @commands.command()
     @checks.admin_or_permissions(manage_guild=True)
     async def toggleAutoMove(self, ctx):
         """Toggle whether or not bot moves members to their assigned 6-mans team voice channel"""
-        new_automove_status = not await self._get_automove(ctx)
+        new_automove_status = not await self._get_automove(ctx.guild)
         await self._save_automove(ctx, new_automove_status)
 
         action = "will move" if new_automove_status else "will not move"
@@ -673,12 +878,12 @@ class SixMans(commands.Cog):
         - **balanced**: creates balanced teams from all participating players
         - **option**: choose from the methods listed above when a queue pops
         """
-        # TODO: Support Captains [captains random, captains shuffle], Balanced
+        # TODO: Support Captains [captains random, captains shuffle]
         team_selection_method = team_selection_method.lower()
         if team_selection_method not in ['random', 'shuffle', 'captains', 'balanced']:
             return await ctx.send("**{}** is not a valid method of team selection.".format(team_selection_method))
 
-        if team_selection_method in ['option', 'balanced']:
+        if team_selection_method in ['option']:
             return await ctx.send("**{}** is not currently supported as a method of team selection.".format(team_selection_method))
         
         await self._save_team_selection(ctx, team_selection_method)
@@ -707,7 +912,7 @@ class SixMans(commands.Cog):
     async def getCategory(self, ctx):
         """Gets the channel currently assigned as the transaction channel"""
         try:
-            await ctx.send("6 mans category channel set to: {0}".format((await self._category(ctx)).mention))
+            await ctx.send("6 mans category channel set to: {0}".format((await self._category(ctx.guild)).mention))
         except:
             await ctx.send(":x: 6 mans category channel not set")
 
@@ -716,7 +921,7 @@ class SixMans(commands.Cog):
     @checks.admin_or_permissions(manage_guild=True)
     async def unsetCategory(self, ctx):
         """Unsets the 6 mans category channel. 6 mans channels will not be created if this is not set"""
-        category = await self._category(ctx)
+        category = await self._category(ctx.guild)
         old_helper_role = await self._helper_role(ctx.guild)
         if old_helper_role and category:
             await category.set_permissions(old_helper_role, overwrite=None)
@@ -729,7 +934,7 @@ class SixMans(commands.Cog):
     async def setHelperRole(self, ctx, helper_role: discord.Role):
         """Sets the 6 mans helper role. Anyone with this role will be able to see all the game channels that are created"""
         await self._save_helper_role(ctx, helper_role.id)
-        category = await self._category(ctx)
+        category = await self._category(ctx.guild)
         # await category.edit(overwrites={helper_role: discord.PermissionOverwrite(read_messages=True, manage_channels=True, connect=True)})
         await category.set_permissions(helper_role, read_messages=True, manage_channels=True, connect=True)
         await ctx.send("Done")
@@ -749,7 +954,7 @@ class SixMans(commands.Cog):
     @checks.admin_or_permissions(manage_guild=True)
     async def unsetHelperRole(self, ctx):
         """Unsets the 6 mans helper role."""
-        category = await self._category(ctx)
+        category = await self._category(ctx.guild)
         old_helper_role = await self._helper_role(ctx.guild)
         if old_helper_role and category:
             await category.set_permissions(old_helper_role, overwrite=None)
@@ -762,10 +967,8 @@ class SixMans(commands.Cog):
         if not await self.has_perms(ctx):
             return
 
-        await self._pre_load_queues(ctx)
-        await self._pre_load_games(ctx, False)
         queueGames = {}
-        for game in self.games:
+        for game in self._guild_games(ctx.guild):
             if game.queueId in queueGames.keys():
                 queueGames[game.queueId].append(game)
             else:
@@ -775,7 +978,7 @@ class SixMans(commands.Cog):
 
         for queue_id in queueGames.keys():
             queue_games = queueGames[queue_id]
-            queue_name = next(queue.name for queue in self.queues if queue.id == queue_id)
+            queue_name = next(queue.name for queue in self._guild_queues(ctx.guild) if queue.id == queue_id)
             embed.add_field(name="{}:".format(queue_name), value="{}".format("\n".join(["{0}\n{1}".format(str(game.id), ", ".join([player.mention for player in game.players])) for game in queue_games])), inline=False)
 
         await ctx.channel.send(embed=embed)
@@ -784,7 +987,8 @@ class SixMans(commands.Cog):
     @commands.guild_only()
     @checks.admin_or_permissions(manage_guild=True)
     async def observers(self, ctx):
-        await ctx.send("There are {} observers.".format(len(self.observers)))
+        dropped = sum(self.game_events.dropped.values())
+        await ctx.send("There are {0} observers. {1} game updates have been dropped for observers that fell behind.".format(len(self.observers), dropped))
 
     @commands.command()
     @checks.admin_or_permissions(manage_guild=True)
@@ -799,6 +1003,7 @@ class SixMans(commands.Cog):
         channel = reaction.message.channel
         if user.id == self.bot.user.id:
             return False
+        await self.loaded.wait()
         
         # Find Game and Queue
         game, queue = self._get_game_and_queue(channel)
@@ -848,12 +1053,12 @@ class SixMans(commands.Cog):
         """If a queue channel is deleted, removes it from the queue class instance. If the last queue channel is deleted, the channel is replaced."""
         if type(channel) != discord.TextChannel:
             return
-        await self._pre_load_queues_from_guild(channel.guild)
-        queue = None
-        for queue in self.queues:
-            if channel in queue.channels:
-                queue.channels.remove(channel)
-                break
+        await self.loaded.wait()
+        queue = self.queues_by_channel.get(channel.id)
+        if queue is None:
+            return
+        queue.channels.remove(channel)
+        self._index_queues()
         if queue.channels:
             return
         
@@ -862,9 +1067,15 @@ class SixMans(commands.Cog):
         helper_ping = " {}".format(helper_role.mention) if helper_role else ""
         await clone.send(":grey_exclamation:{} This channel has been created because the last textChannel for the **{}** queue has been deleted.".format(helper_ping, queue.name))
         queue.channels.append(clone)
+        self._index_queues()
         await self._save_queues(channel.guild, self.queues)
 
 
+    @commands.Cog.listener("on_guild_join")
+    async def on_guild_join(self, guild):
+        await self.loaded.wait()
+        await self._load_guild(guild)
+
     async def has_perms(self, ctx):
         helper_role = await self._helper_role(ctx.guild)
         if ctx.author.guild_permissions.administrator:
@@ -872,29 +1083,36 @@ class SixMans(commands.Cog):
         elif helper_role and helper_role in ctx.author.roles:
             return True
 
-    async def _add_to_queue(self, player, six_mans_queue):
-        six_mans_queue._put(player)
-        player_list = self._format_player_list(six_mans_queue)
-
-        embed = discord.Embed(color=discord.Colour.green())
-        embed.set_author(name="{0} added to the {1} queue. ({2}/{3})".format(player.display_name, six_mans_queue.name,
-            six_mans_queue.queue.qsize(), team_size), icon_url="{}".format(player.avatar_url))
-        embed.add_field(name="Players in Queue", value=player_list, inline=False)
+    async def _add_to_queue(self, player, six_mans_queue, rating=None):
+        self._add_players_to_queue([player], six_mans_queue, [rating])
 
-        for channel in six_mans_queue.channels:
-            await channel.send(embed=embed)
+    def _add_players_to_queue(self, players, six_mans_queue, ratings):
+        """Adds the players to the queue with a single status update for all of them"""
+        if not players:
+            return
+        for player, rating in zip(players, ratings):
+            six_mans_queue._put(player, rating)
+            self.player_queues.setdefault(self._player_key(player), set()).add(six_mans_queue)
+            self._schedule_timeout(player.id, six_mans_queue)
+        self._save_queue_members(six_mans_queue.guild)
+        if len(players) == 1:
+            self.queue_last_actions[six_mans_queue.id] = ("{0} added to the {1} queue.".format(players[0].display_name, six_mans_queue.name),
+                players[0].avatar_url, discord.Colour.green())
+        else:
+            self.queue_last_actions[six_mans_queue.id] = ("{0} players added to the {1} queue.".format(len(players), six_mans_queue.name),
+                None, discord.Colour.green())
+        self.queue_status.request_update(six_mans_queue)
 
     async def _remove_from_queue(self, player, six_mans_queue):
         six_mans_queue._remove(player)
-        player_list = self._format_player_list(six_mans_queue)
-
-        embed = discord.Embed(color=discord.Colour.red())
-        embed.set_author(name="{0} removed from the {1} queue. ({2}/{3})".format(player.display_name, six_mans_queue.name,
-            six_mans_queue.queue.qsize(), team_size), icon_url="{}".format(player.avatar_url))
-        embed.add_field(name="Players in Queue", value=player_list, inline=False)
-
-        for channel in six_mans_queue.channels:
-            await channel.send(embed=embed)
+        self._unindex_player_queue(player, six_mans_queue)
+        self.timeouts.cancel(six_mans_queue.id, player.id)
+        self._save_queue_members(six_mans_queue.guild)
+        self.queue_last_actions[six_mans_queue.id] = ("{0} removed from the {1} queue.".format(player.display_name, six_mans_queue.name),
+            player.avatar_url, discord.Colour.red())
+        self.queue_status.request_update(six_mans_queue)
+        # Without the player who left, the rest of the queue may be able to match sooner than the pending attempt
+        self._schedule_matchmaking(six_mans_queue)
 
     async def _auto_remove_from_queue(self, player, six_mans_queue):
         try:
@@ -905,35 +1123,28 @@ class SixMans(commands.Cog):
             pass
 
     async def timeout_queues(self):
-        """Loop task that checks if any players in a queue have been in there longer than the max queue time and need to be timed out."""
+        """Task that times out players who have been in a queue longer than the max queue time. Sleeps until the next player's deadline."""
         await self.bot.wait_until_ready()
-        while self.bot.get_cog("SixMans") == self:
-            deadline = datetime.datetime.now() - datetime.timedelta(seconds=player_timeout_time)           
-            for queue in self.queues:
-                players_to_remove = []
-                ids_to_remove = []
-                for player_id, join_time in queue.activeJoinLog.items():
-                    if join_time < deadline:
-                        try:
-                            player = self.bot.get_user(player_id)
-                            if player:
-                                players_to_remove.append(player)
-                            else:
-                                # Can't see the user (no shared servers)
-                                ids_to_remove.append(player_id)  
-                        except discord.HTTPException:
-                            pass
-                        except:
-                            ids_to_remove.append(player_id)
-                for player in players_to_remove:
-                    await self._auto_remove_from_queue(player, queue)
-                for player_id in ids_to_remove:
-                    try:
-                        del queue.activeJoinLog[player_id]
-                    except:
-                        pass
-            await asyncio.sleep(loop_time)
-            
+        await self.timeouts.run()
+
+    def _schedule_timeout(self, player_id, six_mans_queue):
+        join_time = six_mans_queue.activeJoinLog.get(player_id)
+        if join_time:
+            self.timeouts.schedule(six_mans_queue.id, player_id, join_time.timestamp() + player_timeout_time)
+
+    async def _timeout_player(self, queue_id, player_id):
+        queue = self.queues_by_id.get(queue_id)
+        if queue is None:
+            return
+        player = next((player for player in queue.queue.queue if player.id == player_id), None)
+        if player:
+            await self._auto_remove_from_queue(player, queue)
+        else:
+            try:
+                del queue.activeJoinLog[player_id]
+            except:
+                pass
+
     async def _finish_game(self, ctx, game, six_mans_queue, winning_team):
         winning_players = []
         losing_players = []
@@ -944,64 +1155,58 @@ class SixMans(commands.Cog):
             winning_players = game.orange
             losing_players = game.blue
 
-        _scores = await self._scores(ctx)
+        _scores = []
         _players = await self._players(ctx)
         _games_played = await self._games_played(ctx)
-        date_time = datetime.datetime.now().strftime("%d-%b-%Y (%H:%M:%S.%f)")
+        _score_buckets = await self._score_buckets(ctx.guild)
+        date_time = int(datetime.datetime.now().timestamp())
         for player in winning_players:
-            score = self._create_player_score(six_mans_queue, player, 1, date_time)
+            score = self._create_player_score(six_mans_queue, game, player, 1, date_time)
             self._give_points(six_mans_queue.players, score)
             self._give_points(_players, score)
-            _scores.insert(0, score)
+            _score_buckets.add_score(score)
+            _scores.append(score)
         for player in losing_players:
-            score = self._create_player_score(six_mans_queue, player, 0, date_time)
+            score = self._create_player_score(six_mans_queue, game, player, 0, date_time)
             self._give_points(six_mans_queue.players, score)
             self._give_points(_players, score)
-            _scores.insert(0, score)
+            _score_buckets.add_score(score)
+            _scores.append(score)
 
         _games_played += 1
         six_mans_queue.gamesPlayed += 1
-
-        await self._save_scores(ctx, _scores)
+        _score_buckets.add_game(six_mans_queue.id, date_time)
+        _score_buckets.prune(date_time)
+        # The scores and rating change are recorded together so a ratings replay either includes the game or runs after it
+        async with self._ratings_lock(ctx.guild):
+            _queue_ratings = await self._queue_ratings(ctx.guild, six_mans_queue.id)
+            _queue_ratings.update_game([player.id for player in winning_players], [player.id for player in losing_players])
+            await self._append_scores(ctx.guild, _scores)
+        self._update_rank_indexes(ctx.guild, six_mans_queue, _players, [score["Player"] for score in _scores])
+        self._clear_leaderboards(ctx.guild, six_mans_queue.id)
+
+        await self._save_score_buckets(ctx.guild, _score_buckets)
+        await self._save_ratings(ctx.guild)
         await self._save_queues(ctx.guild, self.queues)
         await self._save_players(ctx, _players)
         await self._save_games_played(ctx, _games_played)
 
-        if await self._get_automove(ctx): # game.automove not working?
+        if await self._get_automove(ctx.guild): # game.automove not working?
             qlobby_vc = await self._get_q_lobby_vc(ctx.guild)
             if qlobby_vc:
-                await self._move_to_voice(qlobby_vc, game.voiceChannels[0].members)
-                await self._move_to_voice(qlobby_vc, game.voiceChannels[1].members)
+                await self._move_to_voice(qlobby_vc, game.voiceChannels[0].members + game.voiceChannels[1].members)
 
         await self._remove_game(ctx, game)
 
     async def _move_to_voice(self, vc: discord.VoiceChannel, members):
-        for member in members:
-            try:
-                await member.move_to(vc)
-            except:
-                pass
+        await self.channel_cleanup.move_members(members, vc)
 
     async def _remove_game(self, ctx, game):
+        """Removes the game right away, its channels are deleted by the cleanup worker once `channel_sleep_time` has passed"""
         self.games.remove(game)
-        await self._save_games(ctx, self.games)
-        await asyncio.sleep(channel_sleep_time)
-        q_lobby_vc = await self._get_q_lobby_vc(ctx.guild)
-        try:
-            await game.textChannel.delete()
-        except:
-            pass
-        for vc in game.voiceChannels:
-            try:
-                try:
-                    if q_lobby_vc:
-                        for player in vc.members:
-                            await player.move_to(q_lobby_vc)
-                except:
-                    pass
-                await vc.delete()
-            except:
-                pass
+        self._unindex_game(game)
+        await self._save_games(game.guild, self.games)
+        self.channel_cleanup.schedule(game)
 
     def _get_opposing_captain(self, ctx, game):
         opposing_captain = None
@@ -1027,7 +1232,7 @@ class SixMans(commands.Cog):
         player_dict[player_gp_key] = player_dict.get(player_gp_key, 0) + 1
         player_dict[player_wins_key] = player_dict.get(player_wins_key, 0) + win
 
-    def _create_player_score(self, six_mans_queue, player, win, date_time):
+    def _create_player_score(self, six_mans_queue, game, player, win, date_time):
         points_dict = six_mans_queue.points
         if win:
             points_earned = points_dict[pp_play_key] + points_dict[pp_win_key]
@@ -1035,92 +1240,214 @@ class SixMans(commands.Cog):
             points_earned = points_dict[pp_play_key]
         return {
             "Queue": six_mans_queue.id,
+            "Game": game.id,
             "Player": player.id,
             "Win": win,
             "Points": points_earned,
             "DateTime": date_time
         }
 
-    def _filter_scores(self, scores, start_date, queue_id):
-        players = {}
-        valid_scores = 0
-        for score in scores:
-            date_time = datetime.datetime.strptime(score["DateTime"], "%d-%b-%Y (%H:%M:%S.%f)")
-            if  date_time > start_date and (queue_id is None or score["Queue"] == queue_id):
-                self._give_points(players, score)
-                valid_scores +=1
-            else:
+    async def _filter_score_buckets(self, guild, start_date, queue_id):
+        score_buckets = await self._score_buckets(guild)
+        return score_buckets.collect(int(start_date.timestamp()), queue_id)
+
+    async def _build_score_buckets(self, guild):
+        """Rolls existing raw scores up into buckets. Only used for guilds whose scores were saved before buckets existed."""
+        score_buckets = ScoreBuckets()
+        oldest_time = int(datetime.datetime.now().timestamp()) - bucket_retention * bucket_size
+        counted_games = set()
+        async for score in self._iter_scores(guild):
+            if score["DateTime"] < oldest_time:
                 break
-        return players, (valid_scores // 6)
+            score_buckets.add_score(score)
+            game_key = score_game_key(score)
+            if game_key not in counted_games:
+                counted_games.add(game_key)
+                score_buckets.add_game(score["Queue"], score["DateTime"])
+        return score_buckets
+
+    def _rank_index(self, guild, queue_id, players):
+        """Gets the all-time rank index for a queue (or the whole guild if `queue_id` is None), building it from `players` the first time"""
+        key = (guild.id, queue_id)
+        rank_index = self.rank_indexes.get(key)
+        if rank_index is None:
+            rank_index = RankIndex(players)
+            self.rank_indexes[key] = rank_index
+        return rank_index
+
+    def _update_rank_indexes(self, guild, six_mans_queue, players, player_ids):
+        """Updates the all-time rank indexes that have already been built with the new totals of the given players"""
+        for queue_id, players_dict in [(six_mans_queue.id, six_mans_queue.players), (None, players)]:
+            rank_index = self.rank_indexes.get((guild.id, queue_id))
+            if rank_index is None:
+                continue
+            for player_id in player_ids:
+                rank_index.update(player_id, players_dict["{0}".format(player_id)])
 
     def _sort_player_dict(self, player_dict):
         sorted_players = sorted(player_dict.items(), key=lambda x: x[1][player_wins_key], reverse=True)
         return sorted(sorted_players, key=lambda x: x[1][player_points_key], reverse=True)
 
-    async def _format_leaderboard(self, ctx, sorted_players, queue_name, games_played, lb_format):
-        embed = discord.Embed(title="{0} 6 Mans {1} Leaderboard".format(queue_name, lb_format), color=discord.Colour.blue())
-        embed.add_field(name="Games Played", value="{}\n".format(games_played), inline=True)
-        embed.add_field(name="Unique Players", value="{}\n".format(len(sorted_players)), inline=True)
-        
-        index = 1
+    async def _leaderboard(self, ctx, queue_id, lb_format, start_date=None):
+        """Gets a leaderboard for a queue (or the whole guild if `queue_id` is None), from the cache when possible.
+        Leaderboards are cached until a game in the queue finishes, windowed ones also until their window moves on to the next bucket.
+        Returns None if nobody has played in the window."""
+        key = (ctx.guild.id, queue_id, lb_format)
+        window = ScoreBuckets.bucket_key(start_date.timestamp()) if start_date else None
+        leaderboard = self.leaderboards.get(key)
+        if leaderboard is not None and leaderboard["Window"] == window:
+            return leaderboard
+
+        if start_date:
+            players, games_played = await self._filter_score_buckets(ctx.guild, start_date, queue_id)
+        elif queue_id is not None:
+            queue = self.queues_by_id[queue_id]
+            players, games_played = queue.players, queue.gamesPlayed
+        else:
+            players, games_played = await self._players(ctx), await self._games_played(ctx)
+        if not players:
+            return None
+
+        sorted_players = self._sort_player_dict(players)
         message = ""
-        for player in sorted_players:
+        for index, (player_id, player_info) in enumerate(sorted_players[:10], start=1):
             try:
-                member = await commands.MemberConverter().convert(ctx, player[0])
+                member = await commands.MemberConverter().convert(ctx, player_id)
             except:
-                await ctx.send(":x: Can't find player with id: {}".format(player[0]))
-                return
-            player_info = player[1]
+                await ctx.send(":x: Can't find player with id: {}".format(player_id))
+                return None
             message += "`{0}` {1} **Points:** {2}  **Wins:** {3}  **Games Played:** {4}\n".format(index, member.mention, player_info[player_points_key], 
                 player_info[player_wins_key], player_info[player_gp_key])
-            index += 1
-            if index > 10:
-                break
-        
+
+        leaderboard = {
+            "Window": window,
+            "GamesPlayed": games_played,
+            "Players": sorted_players,
+            "Positions": {player_id: index for index, (player_id, _) in enumerate(sorted_players)},
+            "TopTen": message
+        }
+        self.leaderboards[key] = leaderboard
+        return leaderboard
+
+    def _clear_leaderboards(self, guild, queue_id=None):
+        """Drops the guild's cached leaderboards, or only the ones a game finishing in the given queue changes"""
+        for key in list(self.leaderboards.keys()):
+            if key[0] == guild.id and (queue_id is None or key[1] in (queue_id, None)):
+                del self.leaderboards[key]
+
+    def _format_leaderboard(self, ctx, leaderboard, queue_name, lb_format):
+        sorted_players = leaderboard["Players"]
+        embed = discord.Embed(title="{0} 6 Mans {1} Leaderboard".format(queue_name, lb_format), color=discord.Colour.blue())
+        embed.add_field(name="Games Played", value="{}\n".format(leaderboard["GamesPlayed"]), inline=True)
+        embed.add_field(name="Unique Players", value="{}\n".format(len(sorted_players)), inline=True)
+
+        message = leaderboard["TopTen"]
         author = ctx.author
-        try:
-            author_index = [y[0] for y in sorted_players].index("{0}".format(author.id))
-            if author_index is not None and author_index > 9:
-                author_info = sorted_players[author_index][1]
-                message += "\n\n`{0}` {1} **Points:** {2}  **Wins:** {3}  **Games Played:** {4}".format(author_index + 1, author.mention, author_info[player_points_key], 
-                    author_info[player_wins_key], author_info[player_gp_key])
-        except Exception:
-            pass
+        author_index = leaderboard["Positions"].get("{0}".format(author.id))
+        if author_index is not None and author_index > 9:
+            author_info = sorted_players[author_index][1]
+            message += "\n\n`{0}` {1} **Points:** {2}  **Wins:** {3}  **Games Played:** {4}".format(author_index + 1, author.mention, author_info[player_points_key], 
+                author_info[player_wins_key], author_info[player_gp_key])
 
         embed.add_field(name="Most Points", value=message, inline=False)
         return embed
 
-    def _format_rank(self, ctx, player, sorted_players, queue_name, rnk_format):
+    def _format_rating_leaderboard(self, ctx, sorted_players, queue_name):
+        embed = discord.Embed(title="{0} 6 Mans Rating Leaderboard".format(queue_name), color=discord.Colour.blue())
+        embed.add_field(name="Rated Players", value="{}\n".format(len(sorted_players)), inline=True)
+
+        message = ""
+        for index, (player_id, (rating, games)) in enumerate(sorted_players[:10], start=1):
+            member = ctx.guild.get_member(int(player_id))
+            name = member.mention if member else player_id
+            message += "`{0}` {1} **Rating:** {2:.0f}  **Games Played:** {3}\n".format(index, name, rating, games)
+
+        author_id = "{0}".format(ctx.author.id)
+        author_index = next((index for index, (player_id, _) in enumerate(sorted_players) if player_id == author_id), None)
+        if author_index is not None and author_index > 9:
+            rating, games = sorted_players[author_index][1]
+            message += "\n\n`{0}` {1} **Rating:** {2:.0f}  **Games Played:** {3}".format(author_index + 1, ctx.author.mention, rating, games)
+
+        embed.add_field(name="Highest Rated", value=message, inline=False)
+        return embed
+
+    def _format_rank(self, ctx, player, player_ranks, num_players, queue_name, rnk_format):
         try:
-            num_players = len(sorted_players)
-            points_index = [y[0] for y in sorted_players].index("{0}".format(player.id))
-            player_info = sorted_players[points_index][1]
+            player_info, points_rank, wins_rank, games_played_rank = player_ranks
             points, wins, games_played = player_info[player_points_key], player_info[player_wins_key], player_info[player_gp_key]
-            wins_index = [y[0] for y in sorted(sorted_players, key=lambda x: x[1][player_wins_key], reverse=True)].index("{0}".format(player.id))
-            games_played_index = [y[0] for y in sorted(sorted_players, key=lambda x: x[1][player_gp_key], reverse=True)].index("{0}".format(player.id))
             embed = discord.Embed(title="{0} {1} 6 Mans {2} Rank".format(player.display_name, queue_name, rnk_format), color=discord.Colour.blue())
             embed.set_thumbnail(url=player.avatar_url)
-            embed.add_field(name="Points:", value="**Value:** {2} | **Rank:** {0}/{1}".format(points_index + 1, num_players, points), inline=True)
-            embed.add_field(name="Wins:", value="**Value:** {2} | **Rank:** {0}/{1}".format(wins_index + 1, num_players, wins), inline=True)
-            embed.add_field(name="Games Played:", value="**Value:** {2} | **Rank:** {0}/{1}".format(games_played_index + 1, num_players, games_played), inline=True)
+            embed.add_field(name="Points:", value="**Value:** {2} | **Rank:** {0}/{1}".format(points_rank, num_players, points), inline=True)
+            embed.add_field(name="Wins:", value="**Value:** {2} | **Rank:** {0}/{1}".format(wins_rank, num_players, wins), inline=True)
+            embed.add_field(name="Games Played:", value="**Value:** {2} | **Rank:** {0}/{1}".format(games_played_rank, num_players, games_played), inline=True)
         except:
             embed = discord.Embed(title="{0} {1} 6 Mans {2} Rank".format(player.display_name, queue_name, rnk_format), color=discord.Colour.red(),
                 description="No stats yet to rank {}".format(player.mention))
             embed.set_thumbnail(url=player.avatar_url)
         return embed
 
-    async def _select_teams(self, ctx, six_mans_queue):
-        game = await self._create_game(ctx, six_mans_queue)
-        if game is None:
-            return False
-        
+    async def _form_games(self, six_mans_queue):
+        """Pops a game's worth of players for every game the queue can form, then sets those games up concurrently.
+        Only popping players holds the queue's lock, so the next game can be popped while earlier games' channels are still being created.
+        Returns the number of games created."""
+        async with self._queue_lock(six_mans_queue):
+            popped = []
+            while six_mans_queue._queue_full():
+                players = await self._pop_game_players(six_mans_queue)
+                if players is None:
+                    break
+                popped.append(players)
+        if not popped:
+            return 0
+        results = await asyncio.gather(*[self._select_teams(six_mans_queue, players) for players in popped], return_exceptions=True)
+        # Let one game failing to be set up not stop the others, but still surface the error
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return sum(1 for result in results if result is True)
+
+    def _queue_lock(self, six_mans_queue):
+        lock = self.queue_locks.get(six_mans_queue.id)
+        if lock is None:
+            lock = self.queue_locks[six_mans_queue.id] = asyncio.Lock()
+        return lock
+
+    def _in_game(self, player):
+        player_key = self._player_key(player)
+        return player_key in self.player_games or player_key in self.forming_players
+
+    def _player_key(self, player):
+        # Members of different guilds are equal if they're the same user, so the player indexes are keyed by guild as well
+        return (player.guild.id, player.id)
+
+    async def _pop_game_players(self, six_mans_queue):
+        """Takes the players for the next game out of the queue and every other queue they were in"""
+        players = six_mans_queue._pop_players()
+        if players is None:
+            return None
+        for player in players:
+            self._unindex_player_queue(player, six_mans_queue)
+            self.timeouts.cancel(six_mans_queue.id, player.id)
+            self.forming_players.add(self._player_key(player))
+        self._save_queue_members(six_mans_queue.guild)
+        self.queue_last_actions[six_mans_queue.id] = ("{0} queue popped.".format(six_mans_queue.name), None, discord.Colour.blue())
+        self.queue_status.request_update(six_mans_queue)
+
         #Remove players from any other queue they were in
-        for player in game.players:
-            for queue in self.queues:
-                if player in queue.queue:
-                    await self._remove_from_queue(player, queue)
+        for player in players:
+            for queue in list(self.player_queues.get(self._player_key(player), ())):
+                await self._remove_from_queue(player, queue)
+        return players
 
-        team_selection = await self._team_selection(ctx.guild) # TODO: add other methods of player selection (i.e. captains)
+    async def _select_teams(self, six_mans_queue, players):
+        try:
+            game = await self._create_game(six_mans_queue, players)
+            return await self._pick_game_teams(six_mans_queue, game)
+        finally:
+            self.forming_players.difference_update(self._player_key(player) for player in players)
+
+    async def _pick_game_teams(self, six_mans_queue, game):
+        team_selection = await self._team_selection(game.guild) # TODO: add other methods of player selection (i.e. captains)
         
         if team_selection == 'random':
             await game.pick_random_teams()
@@ -1129,23 +1456,66 @@ class SixMans(commands.Cog):
         elif team_selection == 'optional':
             pass
         elif team_selection == 'captains':
-            await game.captains_pick_teams(await self._helper_role(ctx.guild))
+            await game.captains_pick_teams(await self._helper_role(game.guild))
         elif team_selection == 'balanced':
-            await game.pick_balanced_teams()
+            await game.pick_balanced_teams(await self._player_ratings(six_mans_queue, game.players))
         else:
             return print("you messed up fool")
 
         # Display teams
-        if team_selection in ['shuffle', 'random']:
-            embed = await self._get_game_info_embed(ctx, game, six_mans_queue)
+        if team_selection in ['shuffle', 'random', 'balanced']:
+            embed = await self._get_game_info_embed(game, six_mans_queue)
             lobby_info_message = await self._display_teams(game, embed)
             if team_selection == 'shuffle':
                 await lobby_info_message.add_reaction(self.SHUFFLE_REACT)
         
         self.games.append(game)
-        await self._save_games(ctx, self.games)
+        self._index_game(game)
+        await self._save_games(game.guild, self.games)
         return True
 
+    async def _matchmaking_rating(self, six_mans_queue, player):
+        """The rating a player is matched on in a matchmaking queue: their elo rating in the queue"""
+        if not six_mans_queue.matchmaking:
+            return None
+        queue_ratings = await self._queue_ratings(six_mans_queue.guild, six_mans_queue.id)
+        return queue_ratings.rating(player.id)
+
+    def _schedule_matchmaking(self, six_mans_queue):
+        """Schedules another attempt to form a game for when the allowed rating spread will have widened enough to match the players waiting"""
+        handle = self.matchmaking_handles.pop(six_mans_queue.id, None)
+        if handle:
+            handle.cancel()
+        next_match_time = six_mans_queue._next_match_time()
+        if next_match_time is None:
+            return
+        delay = max(next_match_time - datetime.datetime.now().timestamp(), 0) + 1
+        self.matchmaking_handles[six_mans_queue.id] = self.bot.loop.call_later(
+            delay, lambda: self.bot.loop.create_task(self._try_matchmaking(six_mans_queue)))
+
+    async def _try_matchmaking(self, six_mans_queue):
+        self.matchmaking_handles.pop(six_mans_queue.id, None)
+        if self.queues_by_id.get(six_mans_queue.id) != six_mans_queue:
+            return
+        await self._form_games(six_mans_queue)
+        self._schedule_matchmaking(six_mans_queue)
+
+    async def _player_ratings(self, six_mans_queue, players):
+        """Gets a rating for each player to balance teams with: their elo rating in the queue. Players who haven't played in the queue
+        yet use their PlayerRatings cog elo rating if they have one, otherwise the default rating."""
+        queue_ratings = await self._queue_ratings(six_mans_queue.guild, six_mans_queue.id)
+        ratings = {player: queue_ratings.rating(player.id) for player in players}
+
+        unrated_players = [player for player in players if not queue_ratings.games(player.id)]
+        player_ratings_cog = self.bot.get_cog("PlayerRatings")
+        if unrated_players and player_ratings_cog:
+            records = await player_ratings_cog.get_players_records_and_ratings_by_ids(six_mans_queue.guild, [player.id for player in unrated_players])
+            for player in unrated_players:
+                record = records.get(player.id)
+                if record:
+                    ratings[player] = record[2]
+        return ratings
+
     async def _display_teams(self, game, embed):
         try:
             await game.teams_message.edit(embed=embed)
@@ -1153,9 +1523,9 @@ class SixMans(commands.Cog):
             game.teams_message = await game.textChannel.send(embed=embed)
         return game.teams_message
 
-    async def _get_game_info_embed(self, ctx, game, six_mans_queue):
+    async def _get_game_info_embed(self, game, six_mans_queue):
         await game.textChannel.send("{}\n".format(", ".join([player.mention for player in game.players])))
-        return await self._get_updated_game_info_embed(ctx.guild, game, six_mans_queue)
+        return await self._get_updated_game_info_embed(game.guild, game, six_mans_queue)
 
     async def _get_updated_game_info_embed(self, guild, game, six_mans_queue, invalid=False, prefix='?'):
         helper_role = await self._helper_role(guild)
@@ -1186,83 +1556,113 @@ class SixMans(commands.Cog):
         embed.set_footer(text="Game ID: {}".format(game.id))
         return embed
 
-    async def _create_game(self, ctx, six_mans_queue):
-        if not six_mans_queue._queue_full():
-            return None
-        players = [six_mans_queue._get() for _ in range(team_size)]
+    async def _create_game(self, six_mans_queue, players):
         for channel in six_mans_queue.channels:
             await channel.send("**Queue is full! Game is being created.**")
 
         game = Game(
             players,
             six_mans_queue,
-            guild=ctx.guild,
-            category=await self._category(ctx),
-            helper_role=await self._helper_role(ctx.guild),
-            automove=await self._get_automove(ctx),
-            observers=self.observers
+            guild=six_mans_queue.guild,
+            category=await self._category(six_mans_queue.guild),
+            helper_role=await self._helper_role(six_mans_queue.guild),
+            automove=await self._get_automove(six_mans_queue.guild),
+            events=self.game_events
         )
-        await game.create_game_channels(six_mans_queue, await self._category(ctx))
+        await game.create_game_channels(six_mans_queue, await self._category(six_mans_queue.guild))
         return game
 
     async def _get_info(self, ctx):
         game = self._get_game(ctx)
         if game is None:
             await ctx.send(":x: This command can only be used in a 6 mans game channel.")
-            return None
-
-        six_mans_queue = None
-        for queue in self.queues:
-            if queue.id == game.queueId:
-                six_mans_queue = queue
+            return None, None
 
+        six_mans_queue = self.queues_by_id.get(game.queueId)
         if six_mans_queue is None:
             await ctx.send(":x: Queue not found for this channel, please message an Admin if you think this is a mistake.")
-            return None
+            return None, None
         
         return game, six_mans_queue
 
     # adds observer
     def add_observer(self, observer):
+        """Calls `observer.update(game)` for every game lifecycle event. Updates are delivered from the observer's own queue, so `game` is a
+        snapshot taken when the event happened, with `game_state` set to the event."""
         self.observers.add(observer)
+        self.game_events.subscribe(observer, lambda event: self._update_observer(observer, event))
+
+    async def _update_observer(self, observer, event):
+        observer._subject = event.game
+        await observer.update(event.game)
 
     def _get_game_and_queue(self, channel: discord.TextChannel):
-        game = None
-        for g in self.games:
-            if g.textChannel == channel:
-                game = g
-                break
-        queue = None
-        for q in self.queues:
-            if q.id == game.queueId:
-                queue = q
-                return game, queue     
-        return game, queue
+        game = self.games_by_channel.get(channel.id)
+        if game is None:
+            return None, None
+        return game, self.queues_by_id.get(game.queueId)
 
     def _get_game(self, ctx):
-        for game in self.games:
-            if game.textChannel == ctx.channel:
-                return game
+        return self.games_by_channel.get(ctx.channel.id)
 
     def _get_queue(self, ctx):
-        for six_mans_queue in self.queues:
-            for channel in six_mans_queue.channels:
-                if channel == ctx.channel:
-                    return six_mans_queue
+        return self.queues_by_channel.get(ctx.channel.id)
+
+    def _index_queues(self):
+        """Rebuilds the queue lookups. Only needed when queues or their channels change, joining and leaving a queue keep `player_queues` up to date."""
+        self.queues_by_id = {}
+        self.queues_by_channel = {}
+        self.player_queues = {}
+        for queue in self.queues:
+            self.queues_by_id[queue.id] = queue
+            for channel in queue.channels:
+                if channel:
+                    self.queues_by_channel[channel.id] = queue
+            for player in queue.queue.queue:
+                self.player_queues.setdefault(self._player_key(player), set()).add(queue)
+
+    def _unindex_player_queue(self, player, six_mans_queue):
+        player_key = self._player_key(player)
+        queues = self.player_queues.get(player_key)
+        if queues is None:
+            return
+        queues.discard(six_mans_queue)
+        if not queues:
+            del self.player_queues[player_key]
+
+    def _index_games(self):
+        self.games_by_channel = {}
+        self.player_games = {}
+        for game in self.games:
+            self._index_game(game)
+
+    def _index_game(self, game):
+        if game.textChannel:
+            self.games_by_channel[game.textChannel.id] = game
+        for player in game.players | game.blue | game.orange:
+            if player:
+                self.player_games[self._player_key(player)] = game
+
+    def _unindex_game(self, game):
+        if game.textChannel and self.games_by_channel.get(game.textChannel.id) == game:
+            del self.games_by_channel[game.textChannel.id]
+        for player in game.players | game.blue | game.orange:
+            if player and self.player_games.get(self._player_key(player)) == game:
+                del self.player_games[self._player_key(player)]
 
     def _get_queue_name(self, ctx, queue_name):
         if queue_name is None:
             return ctx.guild.name
         else:
-            for queue in self.queues:
+            for queue in self._guild_queues(ctx.guild):
                 if queue.name.lower() == queue_name.lower():
                     return queue.name
 
-    def _get_queue_id_by_name(self, queue_name):
+    def _get_queue_id_by_name(self, ctx, queue_name):
         if queue_name is None:
             return None
         else:
-            for queue in self.queues:
+            for queue in self._guild_queues(ctx.guild):
                 if queue.name.lower() == queue_name.lower():
                     return queue.id
 
@@ -1273,6 +1673,9 @@ class SixMans(commands.Cog):
         embed.add_field(name="Unique Players All-Time", value="{}\n".format(len(queue.players)), inline=False)
         embed.add_field(name="Point Breakdown", value="**Per Series Played:** {0}\n**Per Series Win:** {1}"
             .format(queue.points[pp_play_key], queue.points[pp_win_key]), inline=False)
+        if queue.matchmaking:
+            embed.add_field(name="Matchmaking", value="**Rating Spread:** {0}\n**Widens Per Minute:** {1}\n**Max Wait:** {2} minute(s)"
+                .format(queue.matchmaking[mm_spread_key], queue.matchmaking[mm_widen_key], queue.matchmaking[mm_max_wait_key]), inline=False)
         return embed
 
     def _format_queue(self, ctx, queue):
@@ -1281,122 +1684,354 @@ class SixMans(commands.Cog):
         embed.add_field(name="Players in Queue", value=player_list, inline=False)
         return embed
 
+    def _format_queue_status(self, queue):
+        description, icon_url, colour = self.queue_last_actions.get(queue.id, ("{0} queue.".format(queue.name), None, discord.Colour.blue()))
+        embed = discord.Embed(color=colour)
+        author = "{0} ({1}/{2})".format(description, queue.queue.qsize(), team_size)
+        if icon_url:
+            embed.set_author(name=author, icon_url="{}".format(icon_url))
+        else:
+            embed.set_author(name=author)
+        embed.add_field(name="Players in Queue", value=self._format_player_list(queue), inline=False)
+        return embed
+
     def _format_player_list(self, queue):
         player_list = "{}".format(", ".join([player.mention for player in queue.queue.queue]))
         if player_list == "":
             player_list = "No players currently in the queue"
         return player_list
 
-    async def _pre_load_queues_from_guild(self, guild):
-        if self.queues is None or self.queues == []:
-            queues = await self._queues(guild)
-            self.queues = []
-            for key, value in queues.items():
-                queue_channels = [guild.get_channel(x) for x in value["Channels"]]
-                queue_name = value["Name"]
-                for queue in self.queues:
-                    if queue.name == queue_name:
-                        await queue.channels[0].send(":x: There is already a queue set up with the name: {0}".format(queue.name))
-                        return
-                    for channel in queue_channels:
-                        if channel in queue.channels:
-                            await channel.send(":x: {0} is already being used for queue: {1}".format(channel.mention, queue.name))
-                            return
-
-                six_mans_queue = SixMansQueue(queue_name, guild, queue_channels, value["Points"], value["Players"], value["GamesPlayed"])
-                six_mans_queue.id = int(key)
-                self.queues.append(six_mans_queue)
-
-    async def _pre_load_queues(self, ctx):
-        if self.queues is None or self.queues == []:
-            queues = await self._queues(ctx.guild)
-            self.queues = []
-            for key, value in queues.items():
-                queue_channels = [ctx.guild.get_channel(x) for x in value["Channels"]]
-                queue_name = value["Name"]
-                for queue in self.queues:
-                    if queue.name == queue_name:
-                        await ctx.send(":x: There is already a queue set up with the name: {0}".format(queue.name))
+    async def _load_all_guilds(self):
+        """Loads the queues and games of every guild once the bot is ready"""
+        await self.bot.wait_until_ready()
+        for guild in self.bot.guilds:
+            try:
+                await self._load_guild(guild)
+            except Exception:
+                log.exception("Failed to load the 6 mans queues and games of guild %s", guild.id)
+        self.loaded.set()
+
+    async def _load_guild(self, guild):
+        await self._load_queues(guild)
+        await self._load_games(guild)
+
+    async def _load_queues(self, guild):
+        """Replaces the guild's queues with the ones that have been saved. Players in a queue that already existed stay in it."""
+        queues = await self._queues(guild)
+        queue_members = await self.state.get(guild, "QueueMembers")
+        existing_queues = {queue.id: queue for queue in self._guild_queues(guild)}
+        guild_queues = []
+        for key, value in queues.items():
+            queue_channels = [guild.get_channel(x) for x in value["Channels"]]
+            queue_name = value["Name"]
+            for queue in guild_queues:
+                if queue.name == queue_name:
+                    await queue.channels[0].send(":x: There is already a queue set up with the name: {0}".format(queue.name))
+                    return
+                for channel in queue_channels:
+                    if channel in queue.channels:
+                        await channel.send(":x: {0} is already being used for queue: {1}".format(channel.mention, queue.name))
                         return
-                    for channel in queue_channels:
-                        if channel in queue.channels:
-                            await ctx.send(":x: {0} is already being used for queue: {1}".format(channel.mention, queue.name))
-                            return
-
-                six_mans_queue = SixMansQueue(queue_name, ctx.guild, queue_channels, value["Points"], value["Players"], value["GamesPlayed"])
-                six_mans_queue.id = int(key)
-                self.queues.append(six_mans_queue)
-
-    async def _pre_load_games(self, ctx, force_load):
-        await self._pre_load_queues(ctx)
-        if self.games is None or self.games == [] or force_load:
-            games = await self._games(ctx)
-            game_list = []
-            for key, value in games.items():
-                players = [ctx.guild.get_member(x) for x in value["Players"]]
-                text_channel = ctx.guild.get_channel(value["TextChannel"])
-                voice_channels = [ctx.guild.get_channel(x) for x in value["VoiceChannels"]]
-                queueId = value["QueueId"]
-                for q in self.queues:
-                    if q.id == queueId:
-                        queue = q
-                game = Game(players, queue, text_channel=text_channel, voice_channels=voice_channels, observers=self.observers)
-                game.id = int(key)
-                game.captains = [ctx.guild.get_member(x) for x in value["Captains"]]
-                game.blue = set([ctx.guild.get_member(x) for x in value["Blue"]])
-                game.orange = set([ctx.guild.get_member(x) for x in value["Orange"]])
-                game.roomName = value["RoomName"]
-                game.roomPass = value["RoomPass"]
-                game.scoreReported = value["ScoreReported"]
-                game_list.append(game)
-
-            self.games = game_list
-
-    async def _games(self, ctx):
-        return await self.config.guild(ctx.guild).Games()
-
-    async  def _save_games(self, ctx, games):
+
+            six_mans_queue = SixMansQueue(queue_name, guild, queue_channels, value["Points"], value["Players"], value["GamesPlayed"], value.get("Matchmaking"))
+            six_mans_queue.id = int(key)
+            existing_queue = existing_queues.get(six_mans_queue.id)
+            if existing_queue:
+                six_mans_queue.queue = existing_queue.queue
+                six_mans_queue.activeJoinLog = existing_queue.activeJoinLog
+                six_mans_queue.ratings = existing_queue.ratings
+            else:
+                six_mans_queue._restore_members(self._saved_queue_members(guild, queue_members.get(key, [])))
+            guild_queues.append(six_mans_queue)
+
+        self.queues = [queue for queue in self.queues if queue.guild != guild] + guild_queues
+        self._index_queues()
+        for queue in guild_queues:
+            for player in queue.queue.queue:
+                self._schedule_timeout(player.id, queue)
+            if queue.matchmaking:
+                self._schedule_matchmaking(queue)
+
+    def _saved_queue_members(self, guild, members):
+        """The saved members of a queue that are still in the guild and haven't been in the queue long enough to time out"""
+        now = datetime.datetime.now().timestamp()
+        saved_members = []
+        for player_id, join_time, rating in members:
+            player = guild.get_member(player_id)
+            if player is None or (join_time and join_time + player_timeout_time <= now):
+                continue
+            saved_members.append((player, join_time, rating))
+        return saved_members
+
+    def _save_queue_members(self, guild):
+        queue_members = {}
+        for queue in self._guild_queues(guild):
+            if queue.queue.queue:
+                queue_members[str(queue.id)] = queue._members_to_list()
+        self.state.set(guild, "QueueMembers", queue_members)
+
+    async def _load_games(self, guild):
+        games = await self._games(guild)
+        game_list = []
+        for key, value in games.items():
+            players = [guild.get_member(x) for x in value["Players"]]
+            text_channel = guild.get_channel(value["TextChannel"])
+            voice_channels = [guild.get_channel(x) for x in value["VoiceChannels"]]
+            queueId = value["QueueId"]
+            queue = None
+            for q in self._guild_queues(guild):
+                if q.id == queueId:
+                    queue = q
+            if queue is None:
+                continue
+            game = Game(players, queue, guild=guild, text_channel=text_channel, voice_channels=voice_channels, events=self.game_events)
+            game.id = int(key)
+            game.captains = [guild.get_member(x) for x in value["Captains"]]
+            game.blue = set([guild.get_member(x) for x in value["Blue"]])
+            game.orange = set([guild.get_member(x) for x in value["Orange"]])
+            game.roomName = value["RoomName"]
+            game.roomPass = value["RoomPass"]
+            game.scoreReported = value["ScoreReported"]
+            game_list.append(game)
+
+        self.games = [game for game in self.games if game.guild != guild] + game_list
+        self._index_games()
+
+    def _guild_queues(self, guild):
+        return [queue for queue in self.queues if queue.guild == guild]
+
+    def _guild_games(self, guild):
+        return [game for game in self.games if game.guild == guild]
+
+    async def _games(self, guild):
+        return await self.state.get(guild, "Games")
+
+    async  def _save_games(self, guild, games):
         game_dict = {}
         for game in games:
-            game_dict[game.id] = game._to_dict()
-        await self.config.guild(ctx.guild).Games.set(game_dict)
+            if game.guild == guild:
+                game_dict[str(game.id)] = game._to_dict()
+        self.state.set(guild, "Games", game_dict)
 
     async def _queues(self, guild):
-        return await self.config.guild(guild).Queues()
+        return await self.state.get(guild, "Queues")
 
     async def _save_queues(self, guild, queues):
         queue_dict = {}
         for queue in queues:
             if queue.guild == guild:
-                queue_dict[queue.id] = queue._to_dict()
-        await self.config.guild(guild).Queues.set(queue_dict)
-
-    async def _scores(self, ctx):
-        return await self.config.guild(ctx.guild).Scores()
-
-    async def _save_scores(self, ctx, scores):
-        await self.config.guild(ctx.guild).Scores.set(scores)
+                queue_dict[str(queue.id)] = queue._to_dict()
+        self.state.set(guild, "Queues", queue_dict)
+
+    async def _append_scores(self, guild, scores):
+        """Buffers scores in the state cache, they are written to the score segments with its next flush."""
+        self.state.add_scores(guild, scores)
+
+    async def _write_scores(self, guild, scores):
+        """Appends scores to the newest score segment. Only that segment is read and written, so the cost stays flat as the season grows."""
+        async with self._score_lock(guild):
+            await self._move_legacy_scores(guild)
+            segment_index = await self.config.guild(guild).ScoreSegmentIndex()
+            segment = await self.config.guild(guild).ScoreSegments.get_raw(str(segment_index), default=[])
+            segment.extend(scores)
+            await self.config.guild(guild).ScoreSegments.set_raw(str(segment_index), value=segment)
+            if len(segment) >= score_segment_size:
+                await self.config.guild(guild).ScoreSegmentIndex.set(segment_index + 1)
+
+    async def _iter_scores(self, guild):
+        """Yields every score, newest first, one segment at a time."""
+        if self.state.has_pending_scores(guild):
+            await self.state.flush(guild)
+        await self._migrate_scores(guild)
+        segment_index = await self.config.guild(guild).ScoreSegmentIndex()
+        segment_start = await self.config.guild(guild).ScoreSegmentStart()
+        for index in range(segment_index, segment_start - 1, -1):
+            segment = await self.config.guild(guild).ScoreSegments.get_raw(str(index), default=[])
+            for score in reversed(segment):
+                yield score
+
+    async def _migrate_scores(self, guild):
+        """Moves legacy scores (newest first, formatted date strings) into score segments (oldest first, epoch timestamps).
+        Returns the number of scores migrated."""
+        if not await self.config.guild(guild).Scores():
+            return 0
+        async with self._score_lock(guild):
+            return await self._move_legacy_scores(guild)
+
+    def _score_lock(self, guild):
+        lock = self.score_locks.get(guild.id)
+        if lock is None:
+            lock = self.score_locks[guild.id] = asyncio.Lock()
+        return lock
+
+    async def _move_legacy_scores(self, guild):
+        """Does the work of `_migrate_scores`, with the guild's score lock already held"""
+        # Checked again under the lock, another migration may have finished while this one waited for it
+        legacy_scores = await self.config.guild(guild).Scores()
+        if not legacy_scores:
+            return 0
+
+        def convert():
+            scores = []
+            for score in reversed(legacy_scores):
+                date_time = datetime.datetime.strptime(score["DateTime"], legacy_score_date_format)
+                scores.append(dict(score, DateTime=int(date_time.timestamp())))
+            return scores
+
+        scores = await self.bot.loop.run_in_executor(None, convert)
+
+        # Legacy scores are always older than anything already in a segment
+        segment_index = await self.config.guild(guild).ScoreSegmentIndex()
+        segment_start = await self.config.guild(guild).ScoreSegmentStart()
+        segments = await self.config.guild(guild).ScoreSegments()
+        for index in range(segment_start, segment_index + 1):
+            scores.extend(segments.get(str(index), []))
+
+        segments = {}
+        for index in range(0, len(scores), score_segment_size):
+            segments[str(segment_start + index // score_segment_size)] = scores[index:index + score_segment_size]
+        segment_index = segment_start + len(scores) // score_segment_size
+
+        await self.config.guild(guild).ScoreSegments.set(segments)
+        await self.config.guild(guild).ScoreSegmentIndex.set(segment_index)
+        await self.config.guild(guild).Scores.set([])
+        return len(legacy_scores)
+
+    async def _archive_scores(self, guild, horizon):
+        """Archives every full score segment whose newest score is older than `horizon` days.
+        The raw scores are written to a compressed file in the cog's data folder and their totals are kept in ArchivedScoreTotals under
+        the file's name. Every step can be repeated if the bot stops part way through without counting or listing an archive twice.
+        Returns the number of scores archived."""
+        if self.state.has_pending_scores(guild):
+            await self.state.flush(guild)
+        await self._migrate_scores(guild)
+        cutoff = int((datetime.datetime.now() - datetime.timedelta(days=max(horizon, minimum_archive_horizon))).timestamp())
+        segment_index = await self.config.guild(guild).ScoreSegmentIndex()
+        segment_start = await self.config.guild(guild).ScoreSegmentStart()
+
+        # The current segment is never archived, it is still being appended to
+        scores = []
+        archived_indexes = []
+        for index in range(segment_start, segment_index):
+            segment = await self.config.guild(guild).ScoreSegments.get_raw(str(index), default=[])
+            if segment and segment[-1]["DateTime"] >= cutoff:
+                break
+            scores.extend(segment)
+            archived_indexes.append(index)
+
+        if not archived_indexes:
+            return 0
+
+        if scores:
+            directory = str(cog_data_path(self) / "archive" / str(guild.id))
+            path = await self.bot.loop.run_in_executor(None, write_archive, directory, archived_indexes[0], scores)
+            # Archiving again after being stopped part way starts from the same segment, so it replaces this archive and its totals
+            # instead of adding another one
+            await self.config.guild(guild).ArchivedScoreTotals.set_raw(os.path.basename(path), value=summarize_scores(scores, {}))
+            async with self.config.guild(guild).ScoreArchives() as score_archives:
+                if path not in score_archives:
+                    score_archives.append(path)
+
+        # Segments are only dropped once their scores are safely on disk
+        for index in archived_indexes:
+            await self.config.guild(guild).ScoreSegments.clear_raw(str(index))
+        await self.config.guild(guild).ScoreSegmentStart.set(archived_indexes[-1] + 1)
+        return len(scores)
+
+    async def _score_buckets(self, guild):
+        score_buckets = await self.state.get(guild, "ScoreBuckets")
+        if score_buckets is None:
+            score_buckets = await self._build_score_buckets(guild)
+            await self._save_score_buckets(guild, score_buckets)
+            return score_buckets
+        return ScoreBuckets(score_buckets)
+
+    async def _save_score_buckets(self, guild, score_buckets: ScoreBuckets):
+        self.state.set(guild, "ScoreBuckets", score_buckets.buckets)
+
+    async def _queue_ratings(self, guild, queue_id):
+        ratings = await self.state.get(guild, "Ratings")
+        return QueueRatings(ratings.setdefault("{0}".format(queue_id), {}))
+
+    async def _save_ratings(self, guild):
+        self.state.set(guild, "Ratings", await self.state.get(guild, "Ratings"))
+
+    async def _export_scores(self, guild, file_format, queue_id=None):
+        """Streams every score, oldest first, into an export file. Archives are read line by line and segments one at a time,
+        and scores are written in chunks of `export_chunk_size`. Returns the file's path and the number of scores written."""
+        if self.state.has_pending_scores(guild):
+            await self.state.flush(guild)
+        await self._migrate_scores(guild)
+        directory = str(cog_data_path(self) / "exports" / str(guild.id))
+        name = "scores-{0}".format(int(datetime.datetime.now().timestamp()))
+        path = export_path(directory, name, file_format)
+        exporter = await self.bot.loop.run_in_executor(None, ScoreExporter, path, file_format)
+        try:
+            archives = await self.config.guild(guild).ScoreArchives()
+            for archive_path in archives:
+                if os.path.exists(archive_path):
+                    await self.bot.loop.run_in_executor(None, lambda: exporter.write_archive(read_archive(archive_path), queue_id))
+
+            segment_index = await self.config.guild(guild).ScoreSegmentIndex()
+            segment_start = await self.config.guild(guild).ScoreSegmentStart()
+            chunk = []
+            for index in range(segment_start, segment_index + 1):
+                segment = await self.config.guild(guild).ScoreSegments.get_raw(str(index), default=[])
+                chunk.extend(score for score in segment if queue_id is None or score["Queue"] == queue_id)
+                if len(chunk) >= export_chunk_size:
+                    await self.bot.loop.run_in_executor(None, exporter.write, chunk)
+                    chunk = []
+            await self.bot.loop.run_in_executor(None, exporter.write, chunk)
+        finally:
+            await self.bot.loop.run_in_executor(None, exporter.close)
+        return path, exporter.rows
+
+    async def _replay_ratings(self, guild):
+        """Rebuilds every queue's ratings from the full score history, archived scores included.
+        Games can't finish while the replay runs, so none of them are left out of the replayed ratings."""
+        async with self._ratings_lock(guild):
+            if self.state.has_pending_scores(guild):
+                await self.state.flush(guild)
+            await self._migrate_scores(guild)
+            archives = await self.config.guild(guild).ScoreArchives()
+            segment_index = await self.config.guild(guild).ScoreSegmentIndex()
+            segment_start = await self.config.guild(guild).ScoreSegmentStart()
+            segments = [await self.config.guild(guild).ScoreSegments.get_raw(str(index), default=[]) for index in range(segment_start, segment_index + 1)]
+
+            def replay():
+                archived_scores = itertools.chain.from_iterable(read_archive(path) for path in archives if os.path.exists(path))
+                return replay_scores(itertools.chain(archived_scores, itertools.chain.from_iterable(segments)))
+
+            ratings = await self.bot.loop.run_in_executor(None, replay)
+            self.state.set(guild, "Ratings", ratings)
+            return ratings
+
+    def _ratings_lock(self, guild):
+        lock = self.rating_locks.get(guild.id)
+        if lock is None:
+            lock = self.rating_locks[guild.id] = asyncio.Lock()
+        return lock
 
     async def _games_played(self, ctx):
-        return await self.config.guild(ctx.guild).GamesPlayed()
+        return await self.state.get(ctx.guild, "GamesPlayed")
 
     async def _save_games_played(self, ctx, games_played):
-        await self.config.guild(ctx.guild).GamesPlayed.set(games_played)
+        self.state.set(ctx.guild, "GamesPlayed", games_played)
 
     async def _players(self, ctx):
-        return await self.config.guild(ctx.guild).Players()
+        return await self.state.get(ctx.guild, "Players")
 
     async def _save_players(self, ctx, players):
-        await self.config.guild(ctx.guild).Players.set(players)
+        self.state.set(ctx.guild, "Players", players)
 
-    async def _get_automove(self, ctx):
-        return await self.config.guild(ctx.guild).AutoMove()
+    async def _get_automove(self, guild):
+        return await self.config.guild(guild).AutoMove()
 
     async def _save_automove(self, ctx, automove: bool):
         await self.config.guild(ctx.guild).AutoMove.set(automove)
 
-    async def _category(self, ctx):
-        return ctx.guild.get_channel(await self.config.guild(ctx.guild).CategoryChannel())
+    async def _category(self, guild):
+        return guild.get_channel(await self.config.guild(guild).CategoryChannel())
 
     async def _save_category(self, ctx, category):
         await self.config.guild(ctx.guild).CategoryChannel.set(category)
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+
+log = logging.getLogger("red.sixMans")
+
+class GuildStateCache:
+    """Write-behind cache for the parts of the SixMans guild config that change on every queue action.
+
+    Reads are served from memory once a section has been loaded. Writes only update memory and mark the section as dirty;
+    dirty sections (and any buffered scores) are written to Config together once `flush_delay` seconds have passed since the
+    first unsaved change, or whenever `flush` is called directly.
+    """
+    def __init__(self, config, write_scores, flush_delay):
+        self.config = config
+        self.write_scores = write_scores    # Coroutine function (guild, scores) used to persist buffered scores
+        self.flush_delay = flush_delay
+        self.values = {}                    # guild_id -> {section: value}
+        self.guilds = {}                    # guild_id -> guild
+        self.dirty = {}                     # guild_id -> set of sections
+        self.pending_scores = {}            # guild_id -> list of scores
+        self.flush_task = None
+        self.lock = asyncio.Lock()
+
+    async def get(self, guild, section):
+        guild_values = self.values.setdefault(guild.id, {})
+        if section not in guild_values:
+            guild_values[section] = await self.config.guild(guild).get_attr(section)()
+        return guild_values[section]
+
+    def set(self, guild, section, value):
+        self.values.setdefault(guild.id, {})[section] = value
+        self.dirty.setdefault(guild.id, set()).add(section)
+        self.guilds[guild.id] = guild
+        self._schedule_flush()
+
+    def add_scores(self, guild, scores):
+        self.pending_scores.setdefault(guild.id, []).extend(scores)
+        self.guilds[guild.id] = guild
+        self._schedule_flush()
+
+    def has_pending_scores(self, guild):
+        return bool(self.pending_scores.get(guild.id))
+
+    async def flush(self, guild=None):
+        """Writes every dirty section to Config, or only the given guild's sections.
+        A guild that fails to be written is logged and keeps its unsaved changes for the next flush, the other guilds are still written."""
+        async with self.lock:
+            guild_ids = [guild.id] if guild else list(set(self.dirty.keys()) | set(self.pending_scores.keys()))
+            for guild_id in guild_ids:
+                flush_guild = self.guilds.get(guild_id)
+                if flush_guild is None:
+                    continue
+                try:
+                    await self._flush_guild(guild_id, flush_guild)
+                except Exception:
+                    log.exception("Failed to save the 6 mans state of guild %s", guild_id)
+
+    def has_unsaved_changes(self, guild=None):
+        if guild:
+            return bool(self.dirty.get(guild.id)) or bool(self.pending_scores.get(guild.id))
+        return any(self.dirty.values()) or any(self.pending_scores.values())
+
+    async def _flush_guild(self, guild_id, guild):
+        sections = self.dirty.pop(guild_id, set())
+        try:
+            while sections:
+                section = next(iter(sections))
+                await self.config.guild(guild).get_attr(section).set(self.values[guild_id][section])
+                sections.discard(section)
+        except:
+            # Keep whatever wasn't written dirty so the next flush tries it again
+            self.dirty.setdefault(guild_id, set()).update(sections)
+            raise
+        scores = self.pending_scores.pop(guild_id, [])
+        if scores:
+            try:
+                await self.write_scores(guild, scores)
+            except:
+                self.pending_scores[guild_id] = scores + self.pending_scores.get(guild_id, [])
+                raise
+
+    async def reload(self, guild):
+        """Saves the guild's unsaved changes and drops its cached sections so they are read from Config again"""
+        await self.flush(guild)
+        # Values that failed to be saved are kept, dropping them would lose the changes
+        if not self.has_unsaved_changes(guild):
+            self.values.pop(guild.id, None)
+
+    def clear(self):
+        """Drops everything held in memory without saving it"""
+        if self.flush_task:
+            self.flush_task.cancel()
+            self.flush_task = None
+        self.values = {}
+        self.guilds = {}
+        self.dirty = {}
+        self.pending_scores = {}
+
+    def _schedule_flush(self):
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.ensure_future(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_delay)
+        # Changes made while this flush is writing need to schedule a flush of their own
+        self.flush_task = None
+        await self.flush()
+        # Anything that failed to be written is retried after another delay instead of waiting for the next change
+        if self.has_unsaved_changes():
+            self._schedule_flush()
@@ -0,0 +1,58 @@
+import asyncio
+
+class QueueStatusUpdater:
+    """Keeps one live status message per queue channel and edits it with the queue's latest state.
+
+    Updates for a queue are coalesced: a queue's messages are edited at most once every `interval` seconds, and an update that
+    arrives while one is already waiting is simply picked up by it since the embed is rendered right before it is sent.
+    """
+    def __init__(self, render, interval):
+        self.render = render                # Function (queue) -> discord.Embed
+        self.interval = interval
+        self.messages = {}                  # channel id -> live status message
+        self.last_update = {}               # queue id -> loop time of the last update
+        self.tasks = {}                     # queue id -> pending update task
+
+    def request_update(self, queue):
+        task = self.tasks.get(queue.id)
+        if task and not task.done():
+            return
+        self.tasks[queue.id] = asyncio.ensure_future(self._update(queue))
+
+    def track(self, channel, message):
+        """Makes `message` the live status message for the channel"""
+        self.messages[channel.id] = message
+
+    def clear(self):
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks = {}
+        self.messages = {}
+        self.last_update = {}
+
+    async def _update(self, queue):
+        loop = asyncio.get_event_loop()
+        last_update = self.last_update.get(queue.id)
+        if last_update is not None:
+            delay = last_update + self.interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        self.last_update[queue.id] = loop.time()
+        # Anything that changes while the messages are being sent schedules the next update
+        self.tasks.pop(queue.id, None)
+
+        embed = self.render(queue)
+        await asyncio.gather(*[self._show(channel, embed) for channel in queue.channels if channel])
+
+    async def _show(self, channel, embed):
+        message = self.messages.get(channel.id)
+        if message:
+            try:
+                await message.edit(embed=embed)
+                return
+            except:
+                pass
+        try:
+            self.messages[channel.id] = await channel.send(embed=embed)
+        except:
+            pass
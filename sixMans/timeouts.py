@@ -0,0 +1,63 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+class QueueTimeoutScheduler:
+    """Times players out of queues using a min-heap of deadlines.
+
+    The scheduler sleeps until the earliest deadline (or until an earlier one is scheduled) instead of polling every queue.
+    Cancelled entries are only marked as such and are dropped when they reach the top of the heap.
+    """
+    def __init__(self, on_expire):
+        self.on_expire = on_expire          # Coroutine function (queue_id, player_id) called when a deadline passes
+        self.heap = []                      # [deadline, sequence, queue_id, player_id, active]
+        self.entries = {}                   # (queue_id, player_id) -> heap entry
+        self.sequence = itertools.count()
+        self.wakeup = asyncio.Event()
+
+    def schedule(self, queue_id, player_id, deadline: float):
+        """Schedules (or reschedules) a player's timeout. `deadline` is an epoch timestamp."""
+        self.cancel(queue_id, player_id)
+        entry = [deadline, next(self.sequence), queue_id, player_id, True]
+        self.entries[(queue_id, player_id)] = entry
+        heapq.heappush(self.heap, entry)
+        if self.heap[0] is entry:
+            self.wakeup.set()
+
+    def cancel(self, queue_id, player_id):
+        entry = self.entries.pop((queue_id, player_id), None)
+        if entry:
+            entry[-1] = False
+            # Don't let cancelled entries pile up when players join and leave a lot
+            if len(self.heap) > 2 * len(self.entries) + 64:
+                self.heap = [heap_entry for heap_entry in self.heap if heap_entry[-1]]
+                heapq.heapify(self.heap)
+
+    def clear(self):
+        self.heap = []
+        self.entries = {}
+        self.wakeup.set()
+
+    async def run(self):
+        while True:
+            while self.heap and not self.heap[0][-1]:
+                heapq.heappop(self.heap)
+
+            delay = self.heap[0][0] - time.time() if self.heap else None
+            if delay is not None and delay <= 0:
+                deadline, _, queue_id, player_id, _ = heapq.heappop(self.heap)
+                del self.entries[(queue_id, player_id)]
+                try:
+                    await self.on_expire(queue_id, player_id)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    pass
+                continue
+
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
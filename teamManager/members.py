@@ -0,0 +1,37 @@
+class MemberRoleIndex:
+    """Which members of a guild have each role, so finding a team's members doesn't mean checking every member's roles.
+
+    Built once from the guild's members and kept current from member update, join and leave events. The default role
+    is left out since every member has it.
+    """
+    def __init__(self, members):
+        self.role_members = {}              # role id -> set of member ids
+        for member in members:
+            self.add_member(member)
+
+    def add_member(self, member):
+        for role in member.roles:
+            if not role.is_default():
+                self.role_members.setdefault(role.id, set()).add(member.id)
+
+    def remove_member(self, member):
+        for role in member.roles:
+            member_ids = self.role_members.get(role.id)
+            if member_ids:
+                member_ids.discard(member.id)
+
+    def update_member(self, before, after):
+        if before.roles == after.roles:
+            return
+        self.remove_member(before)
+        self.add_member(after)
+
+    def remove_role(self, role):
+        self.role_members.pop(role.id, None)
+
+    def member_ids(self, *roles):
+        """The ids of the members that have every one of the roles"""
+        if not roles or any(role is None for role in roles):
+            return set()
+        role_member_ids = sorted((self.role_members.get(role.id, set()) for role in roles), key=len)
+        return role_member_ids[0].intersection(*role_member_ids[1:])
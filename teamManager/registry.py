@@ -0,0 +1,40 @@
+FRANCHISE_ROLE_KEY = "Franchise Role"
+TIER_ROLE_KEY = "Tier Role"
+
+class TeamRegistry:
+    """A guild's teams and the franchise and tier role ids that make them up, indexed by every way teams are looked up.
+
+    Built from the saved `Teams` and `Team_Roles` and thrown away whenever either of them is saved. Lists of teams keep
+    the order teams were added in.
+    """
+    def __init__(self, teams, team_roles):
+        self.teams = []
+        self.roles = {}             # team name -> (franchise role id, tier role id)
+        self.by_roles = {}          # (franchise role id, tier role id) -> team name
+        self.by_franchise = {}      # franchise role id -> [team names]
+        self.by_tier = {}           # tier role id -> [team names]
+        for team in teams:
+            team_data = team_roles.get(team)
+            if not team_data:
+                continue
+            role_ids = (team_data[FRANCHISE_ROLE_KEY], team_data[TIER_ROLE_KEY])
+            self.teams.append(team)
+            self.roles[team] = role_ids
+            self.by_roles.setdefault(role_ids, team)
+            self.by_franchise.setdefault(role_ids[0], []).append(team)
+            self.by_tier.setdefault(role_ids[1], []).append(team)
+
+    def team_for_roles(self, franchise_role, tier_role):
+        if franchise_role is None or tier_role is None:
+            return None
+        return self.by_roles.get((franchise_role.id, tier_role.id))
+
+    def teams_for_franchise(self, franchise_role):
+        if franchise_role is None:
+            return []
+        return list(self.by_franchise.get(franchise_role.id, []))
+
+    def teams_for_tier(self, tier_role):
+        if tier_role is None:
+            return []
+        return list(self.by_tier.get(tier_role.id, []))
@@ -0,0 +1,32 @@
+import re
+
+gm_name_pattern = re.compile(r'(?<=\().*(?=\))')
+franchise_name_pattern = re.compile(r'.+?(?= \()')
+
+class RoleIndex:
+    """Lookup tables for a guild's roles, so finding a role by name doesn't mean scanning (and regex matching) every role.
+
+    Franchise roles are named "<Franchise Name> (<GM Name>)". Where several roles share a key the first one in the guild's
+    role order wins, the same role a scan of `guild.roles` would have found.
+    """
+    def __init__(self, roles):
+        self.by_name = {}               # lower-cased role name -> role
+        self.by_exact_name = {}         # role name -> role
+        self.by_gm_name = {}            # GM name in a franchise role's name -> role
+        self.by_franchise_name = {}     # lower-cased franchise name in a franchise role's name -> role
+        self.gm_names = {}              # franchise role id -> GM name
+        self.franchise_roles = []
+        for role in roles:
+            self.by_name.setdefault(role.name.lower(), role)
+            self.by_exact_name.setdefault(role.name, role)
+            gm_names = gm_name_pattern.findall(role.name)
+            if gm_names:
+                self.by_gm_name.setdefault(gm_names[0], role)
+                self.gm_names[role.id] = gm_names[0]
+                self.franchise_roles.append(role)
+            franchise_names = franchise_name_pattern.findall(role.name)
+            if franchise_names:
+                self.by_franchise_name.setdefault(franchise_names[0].lower(), role)
+
+    def find(self, role_name):
+        return self.by_name.get(role_name.lower())
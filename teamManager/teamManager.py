@@ -12,6 +12,10 @@ from redbot.core.utils.predicates import MessagePredicate
 from redbot.core.utils.predicates import ReactionPredicate
 from redbot.core.utils.menus import start_adding_reactions
 
+from .members import MemberRoleIndex
+from .registry import TeamRegistry
+from .roles import RoleIndex
+
 
 defaults = {"Tiers": [], "Teams": [], "Team_Roles": {}}
 verify_timeout = 30
@@ -32,6 +36,9 @@ class TeamManager(commands.Cog):
         self.config = Config.get_conf(self, identifier=1234567892, force_registration=True)
         self.config.register_guild(**defaults)
         self.prefix_cog = bot.get_cog("PrefixManager")
+        self.team_registries = {}       # guild id -> TeamRegistry, rebuilt after teams, team roles or tiers change
+        self.role_indexes = {}          # guild id -> RoleIndex, rebuilt after roles are created, updated or deleted
+        self.member_indexes = {}        # guild id -> MemberRoleIndex, kept current from member events
 
     @commands.command()
     @commands.guild_only()
@@ -104,6 +111,7 @@ class TeamManager(commands.Cog):
             if gm_active:
                 await gm.remove_roles(gm_role)
             await franchise_role.delete()
+            self._clear_role_caches(ctx.guild)
             await self.prefix_cog.remove_prefix(ctx, gm_name)
             await self._set_user_nickname_prefix(ctx, None, gm)
             await ctx.send("Done.")
@@ -143,6 +151,7 @@ class TeamManager(commands.Cog):
         franchise_name = self.get_franchise_name_from_role(franchise_role)
         new_franchise_name = "{0} ({1})".format(franchise_name, new_gm.name)
         await franchise_role.edit(name=new_franchise_name)
+        self._clear_role_caches(ctx.guild)
 
         # change prefix association to new GM
         await self.prefix_cog.remove_prefix(ctx, old_gm_name)
@@ -460,25 +469,25 @@ class TeamManager(commands.Cog):
         perm_fa_role = self._find_role_by_name(ctx, self.PERM_FA_ROLE)
 
         message = "```"
-        for member in ctx.message.guild.members:
-            if fa_role in member.roles:
-                if filter: # Optional filter for PermFA and signable FAs
-                    if filter.lower() in perm_fa_filters:
-                        if perm_fa_role is not None and perm_fa_role in member.roles:
-                            message += "\n{0} {1}".format(member.display_name, ("(Permanent FA)"))
-                    elif filter.lower() in signable_fa_filters:
-                        if perm_fa_role is not None and perm_fa_role not in member.roles:
-                            message += "\n{0}".format(member.display_name)
-                else:
-                    message += "\n{0}".format(member.display_name)
-                    if perm_fa_role is not None and perm_fa_role in member.roles:
-                        message += " (Permanent FA)"
+        for member in self._members_with_roles(ctx.guild, fa_role):
+            is_perm_fa = perm_fa_role is not None and perm_fa_role in member.roles
+            if filter: # Optional filter for PermFA and signable FAs
+                if filter.lower() in perm_fa_filters:
+                    if is_perm_fa:
+                        message += "\n{0} {1}".format(member.display_name, ("(Permanent FA)"))
+                elif filter.lower() in signable_fa_filters:
+                    if perm_fa_role is not None and not is_perm_fa:
+                        message += "\n{0}".format(member.display_name)
+            else:
+                message += "\n{0}".format(member.display_name)
+                if is_perm_fa:
+                    message += " (Permanent FA)"
         message += "```"
 
         color = discord.Colour.blue()
-        for role in ctx.guild.roles:
-            if role.name.lower() == tier_name.lower():
-                color = role.color
+        tier_role = self._get_tier_role(ctx, tier_name)
+        if tier_role:
+            color = tier_role.color
         embed = discord.Embed(title="{0} Free Agents:".format(tier_name), color=color, 
             description=message, thumbnail=ctx.guild.icon_url)
                     
@@ -569,12 +578,7 @@ class TeamManager(commands.Cog):
         """Retrieve the list of all users that are on the team
         indicated by the provided franchise_role and tier_role.
         """
-        team_members = []
-        for member in ctx.message.guild.members:
-            if franchise_role in member.roles:
-                if tier_role in member.roles:
-                    team_members.append(member)
-        return team_members
+        return self._members_with_roles(ctx.guild, franchise_role, tier_role)
 
     async def create_roster_embed(self, ctx, team_name):
         franchise_role, tier_role = await self._roles_for_team(ctx, team_name)
@@ -598,12 +602,20 @@ class TeamManager(commands.Cog):
         except:
             pass
 
+        # Look up every member's record at once instead of reloading all the players for each member
+        records = None
+        try:
+            player_ratings = self.bot.get_cog("PlayerRatings")
+            records = await player_ratings.get_players_records_and_ratings_by_ids(ctx.guild, [member.id for member in team_members])
+        except:
+            pass
+
         message = "```\n{0} - {1} - {2}:\n".format(team_name, franchise_role.name, tier_role.name)
         subbed_out_message = ""
         
         for member in team_members:
             role_tags = ["C"] if member == captain else []
-            user_message = await self._format_team_member_for_message(ctx, member, *role_tags)
+            user_message = await self._format_team_member_for_message(ctx, member, *role_tags, records=records)
             if self.is_subbed_out(member):
                 subbed_out_message += "  {0}\n".format(user_message)
             else:
@@ -692,22 +704,21 @@ class TeamManager(commands.Cog):
         return embed
 
     async def _get_team_captain(self, ctx, franchise_role: discord.Role, tier_role: discord.Role):
-        captain_role = self._find_role_by_name(ctx, "Captain")
-        members = self.members_from_team(ctx, franchise_role, tier_role)
-        for member in members:
-            if captain_role in member.roles:
-                return member
-        return None
+        captain_role = self._find_role_by_name(ctx, self.CAPTAN_ROLE)
+        captains = self._members_with_roles(ctx.guild, franchise_role, tier_role, captain_role)
+        return captains[0] if captains else None
             
     async def _create_role(self, ctx, role_name: str):
         """Creates and returns a new Guild Role"""
-        for role in ctx.guild.roles:
-            if role.name == role_name:
-                await ctx.send("The role \"{0}\" already exists in the server.".format(role_name))
-                return None
-        return await ctx.guild.create_role(name=role_name)
-
-    async def _format_team_member_for_message(self, ctx, member, *args):
+        if role_name in self._role_index(ctx.guild).by_exact_name:
+            await ctx.send("The role \"{0}\" already exists in the server.".format(role_name))
+            return None
+        role = await ctx.guild.create_role(name=role_name)
+        self._clear_role_caches(ctx.guild)
+        return role
+
+    async def _format_team_member_for_message(self, ctx, member, *args, records=None):
+        """`records` maps member ids to their (wins, losses, rating) when they've already been looked up for a whole roster"""
         extraRoles = list(args)
         if self.is_gm(member):
             extraRoles.insert(0, "GM")
@@ -718,8 +729,11 @@ class TeamManager(commands.Cog):
             roleString = " ({0})".format("|".join(extraRoles))
         recordString = ""
         try:
-            player_ratings = self.bot.get_cog("PlayerRatings")
-            wins, losses, rating = await player_ratings.get_player_record_and_rating_by_id(ctx, member.id)
+            if records is not None:
+                wins, losses, rating = records[member.id]
+            else:
+                player_ratings = self.bot.get_cog("PlayerRatings")
+                wins, losses, rating = await player_ratings.get_player_record_and_rating_by_id(ctx, member.id)
             if wins is not None:
                 recordString = " ({0}-{1}, {2})".format(wins, losses, rating)
         except:
@@ -744,17 +758,81 @@ class TeamManager(commands.Cog):
         teams_message = ""
         for team in teams:
             franchise_role = (await self._roles_for_team(ctx, team))[0]
-            gmNameFromRole = re.findall(r'(?<=\().*(?=\))', franchise_role.name)[0]
+            gmNameFromRole = self._get_gm_name(franchise_role)
             teams_message += "\n\t{0} ({1})".format(team, gmNameFromRole)
 
         color = discord.Colour.blue()
-        for role in ctx.guild.roles:
-            if role.name.lower() == tier.lower():
-                color = role.color
+        tier_role = self._get_tier_role(ctx, tier)
+        if tier_role:
+            color = tier_role.color
 
         embed = discord.Embed(title="{0} teams:".format(tier), color=color, description=teams_message)
         return embed
 
+    @commands.Cog.listener("on_guild_role_create")
+    async def on_guild_role_create(self, role):
+        self._clear_role_caches(role.guild)
+
+    @commands.Cog.listener("on_guild_role_update")
+    async def on_guild_role_update(self, before, after):
+        self._clear_role_caches(after.guild)
+
+    @commands.Cog.listener("on_guild_role_delete")
+    async def on_guild_role_delete(self, role):
+        self._clear_role_caches(role.guild)
+        member_index = self.member_indexes.get(role.guild.id)
+        if member_index:
+            member_index.remove_role(role)
+
+    @commands.Cog.listener("on_member_update")
+    async def on_member_update(self, before, after):
+        member_index = self.member_indexes.get(after.guild.id)
+        if member_index:
+            member_index.update_member(before, after)
+
+    @commands.Cog.listener("on_member_join")
+    async def on_member_join(self, member):
+        member_index = self.member_indexes.get(member.guild.id)
+        if member_index:
+            member_index.add_member(member)
+
+    @commands.Cog.listener("on_member_remove")
+    async def on_member_remove(self, member):
+        member_index = self.member_indexes.get(member.guild.id)
+        if member_index:
+            member_index.remove_member(member)
+
+    def _clear_role_caches(self, guild):
+        self.role_indexes.pop(guild.id, None)
+        self.team_registries.pop(guild.id, None)
+
+    def _member_index(self, guild):
+        """The guild's member role index, or None until every member of the guild has been received"""
+        member_index = self.member_indexes.get(guild.id)
+        # Members that haven't been received yet won't get a join event, so only keep an index built from every member
+        if member_index is None and guild.chunked:
+            member_index = self.member_indexes[guild.id] = MemberRoleIndex(guild.members)
+        return member_index
+
+    def _members_with_roles(self, guild, *roles):
+        """The members that have every one of the roles, sorted by name"""
+        member_index = self._member_index(guild)
+        if member_index is not None:
+            members = [guild.get_member(member_id) for member_id in member_index.member_ids(*roles)]
+        elif roles and all(role is not None for role in roles):
+            # An index that can't be kept would be thrown away after this one lookup, so just check the members directly
+            members = [member for member in guild.members if all(role in member.roles for role in roles)]
+        else:
+            members = []
+        return sorted([member for member in members if member], key=lambda member: member.display_name.casefold())
+
+    def _role_index(self, guild):
+        role_index = self.role_indexes.get(guild.id)
+        if role_index is None:
+            role_index = RoleIndex(guild.roles)
+            self.role_indexes[guild.id] = role_index
+        return role_index
+
     async def tiers(self, ctx):
         return await self.config.guild(ctx.guild).Tiers()
 
@@ -768,6 +846,7 @@ class TeamManager(commands.Cog):
                 await tier_role.delete()
             if tier_fa_role:
                 await tier_fa_role.delete()
+            self._clear_role_caches(ctx.guild)
             tiers = await self.tiers(ctx)
             try:
                 tiers.remove(tier_name)
@@ -780,6 +859,7 @@ class TeamManager(commands.Cog):
 
     async def _save_tiers(self, ctx, tiers):
         await self.config.guild(ctx.guild).Tiers.set(tiers)
+        self.team_registries.pop(ctx.guild.id, None)
 
     def _extract_tier_from_role(self, team_role):
         tier_matches = re.findall(r'\w*\b(?=\))', team_role.name)
@@ -842,35 +922,37 @@ class TeamManager(commands.Cog):
         return True
 
     def _get_tier_role(self, ctx, tier: str):
-        roles = ctx.message.guild.roles
-        for role in roles:
-            if role.name.lower() == tier.lower():
-                return role
-        return None
+        return self._role_index(ctx.guild).find(tier)
 
     async def _teams(self, ctx):
         return await self.config.guild(ctx.guild).Teams()
 
     async def _save_teams(self, ctx, teams):
         await self.config.guild(ctx.guild).Teams.set(teams)
+        self.team_registries.pop(ctx.guild.id, None)
 
     async def _team_roles(self, ctx):
         return await self.config.guild(ctx.guild).Team_Roles()
 
     async def _save_team_roles(self, ctx, team_roles):
         await self.config.guild(ctx.guild).Team_Roles.set(team_roles)
+        self.team_registries.pop(ctx.guild.id, None)
+
+    async def _team_registry(self, ctx):
+        registry = self.team_registries.get(ctx.guild.id)
+        if registry is None:
+            registry = TeamRegistry(await self._teams(ctx), await self._team_roles(ctx))
+            self.team_registries[ctx.guild.id] = registry
+        return registry
 
     def _find_role(self, ctx, role_id):
-        for role in ctx.message.guild.roles:
-            if role.id == role_id:
-                return role
+        role = ctx.guild.get_role(role_id)
+        if role is not None:
+            return role
         raise LookupError('No role with id: {0} found in server roles'.format(role_id))
 
     def _find_role_by_name(self, ctx, role_name):
-        for role in ctx.message.guild.roles:
-            if role.name.lower() == role_name.lower():
-                return role
-        return None
+        return self._role_index(ctx.guild).find(role_name)
 
     def _find_member_by_name(self, ctx, member_name: str):
         for member in ctx.guild.members:
@@ -879,32 +961,16 @@ class TeamManager(commands.Cog):
         return None
     
     def _get_franchise_role(self, ctx, gm_name):
-        for role in ctx.message.guild.roles:
-            try:
-                gmNameFromRole = re.findall(r'(?<=\().*(?=\))', role.name)[0]
-                if gmNameFromRole == gm_name:
-                    return role
-            except:
-                continue
+        return self._role_index(ctx.guild).by_gm_name.get(gm_name)
 
     def _get_all_franchise_roles(self, ctx):
-        franchise_roles = []
-        for role in ctx.message.guild.roles:
-            try:
-                gmNameFromRole = re.findall(r'(?<=\().*(?=\))', role.name)[0]
-                if gmNameFromRole is not None:
-                    franchise_roles.append(role)
-            except:
-                continue
-        return franchise_roles
+        return list(self._role_index(ctx.guild).franchise_roles)
 
     async def _roles_for_team(self, ctx, team_name: str):
-        teams = await self._teams(ctx)
-        if teams and team_name in teams:
-            team_roles = await self._team_roles(ctx)
-            team_data = team_roles.setdefault(team_name, {})
-            franchise_role_id = team_data["Franchise Role"]
-            tier_role_id = team_data["Tier Role"]
+        registry = await self._team_registry(ctx)
+        role_ids = registry.roles.get(team_name)
+        if role_ids:
+            franchise_role_id, tier_role_id = role_ids
             franchise_role = self._find_role(ctx, franchise_role_id)
             tier_role = self._find_role(ctx, tier_role_id)
             return (franchise_role, tier_role)
@@ -912,43 +978,26 @@ class TeamManager(commands.Cog):
            raise LookupError('No team with name: {0}'.format(team_name))
 
     async def _find_team_name(self, ctx, franchise_role, tier_role):
-        teams = await self._teams(ctx)
-        for team in teams:
-            if await self._roles_for_team(ctx, team) == (franchise_role, tier_role):
-                return team
+        registry = await self._team_registry(ctx)
+        return registry.team_for_roles(franchise_role, tier_role)
 
     async def _find_teams_for_franchise(self, ctx, franchise_role):
-        franchise_teams = []
-        teams = await self._teams(ctx)
-        for team in teams:
-            if (await self._roles_for_team(ctx, team))[0] == franchise_role:
-                franchise_teams.append(team)
-        return franchise_teams
+        registry = await self._team_registry(ctx)
+        return registry.teams_for_franchise(franchise_role)
 
     async def _find_franchise_tier_roles(self, ctx, franchise_role: discord.Role):
-        franchise_tier_roles = []
-        teams = await self._teams(ctx)
-        for team in teams:
-            if (await self._roles_for_team(ctx, team))[0] == franchise_role:
-                tier_role = (await self._roles_for_team(ctx, team))[1]
-                franchise_tier_roles.append(tier_role)
-        return franchise_tier_roles
+        registry = await self._team_registry(ctx)
+        return [self._find_role(ctx, registry.roles[team][1]) for team in registry.teams_for_franchise(franchise_role)]
 
     async def _get_franchise_tier_team(self, ctx, franchise_role: discord.Role, tier_role: discord.Role):
-        teams = await self._teams(ctx)
-        for team in teams:
-            if (await self._roles_for_team(ctx, team)) == (franchise_role, tier_role):
-                return team
-        return None
+        registry = await self._team_registry(ctx)
+        return registry.team_for_roles(franchise_role, tier_role)
     
     def get_current_franchise_role(self, user: discord.Member):
+        gm_names = self._role_index(user.guild).gm_names
         for role in user.roles:
-            try:
-                gmNameFromRole = re.findall(r'(?<=\().*(?=\))', role.name)[0]
-                if gmNameFromRole:
-                    return role
-            except:
-                continue
+            if gm_names.get(role.id):
+                return role
 
     async def get_current_tier_role(self, ctx, user: discord.Member):
         tierList = await self.tiers(ctx)
@@ -982,13 +1031,7 @@ class TeamManager(commands.Cog):
             await ctx.send("Changing nickname forbidden for user: {0}".format(user.name))
 
     def get_franchise_role_from_name(self, ctx, franchise_name: str):
-        for role in ctx.message.guild.roles:
-            try:
-                matchedString = re.findall(r'.+?(?= \()', role.name)[0]
-                if matchedString.lower() == franchise_name.lower():
-                    return role
-            except:
-                continue
+        return self._role_index(ctx.guild).by_franchise_name.get(franchise_name.lower())
 
     def get_franchise_name_from_role(self, franchise_role: discord.Role):
         end_of_name = franchise_role.name.rindex("(") - 1
@@ -1012,13 +1055,8 @@ class TeamManager(commands.Cog):
         return None
 
     async def _find_teams_for_tier(self, ctx, tier):
-        teams_in_tier = []
-        teams = await self._teams(ctx)
-        for team in teams:
-            team_tier = (await self._roles_for_team(ctx, team))[1]
-            if team_tier.name.lower() == tier.lower():
-                teams_in_tier.append(team)
-        return teams_in_tier
+        registry = await self._team_registry(ctx)
+        return registry.teams_for_tier(self._get_tier_role(ctx, tier))
 
     async def _get_franchise_emoji(self, ctx, franchise_role):
         prefix = await self.prefix_cog._get_franchise_prefix(ctx, franchise_role)
@@ -1030,12 +1068,14 @@ class TeamManager(commands.Cog):
                     return emoji
 
     def _get_gm(self, ctx, franchise_role):
-        for member in ctx.message.guild.members:
-            if franchise_role in member.roles:
-                if self.is_gm(member):
-                    return member
+        gm_role = self._find_role_by_name(ctx, self.GM_ROLE)
+        gms = self._members_with_roles(ctx.guild, franchise_role, gm_role)
+        return gms[0] if gms else None
         
     def _get_gm_name(self, franchise_role):
+        gm_name = self._role_index(franchise_role.guild).gm_names.get(franchise_role.id)
+        if gm_name is not None:
+            return gm_name
         try:
             return re.findall(r'(?<=\().*(?=\))', franchise_role.name)[0]
         except: